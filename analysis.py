@@ -0,0 +1,187 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Callable, NamedTuple
+from book import OpeningBook
+from engine import Engine, MAX_PLY, SearchInfo
+from position import Position
+
+PLAY = "play"
+PONDER = "ponder"
+ANALYSE = "analyse"
+PONDERHIT = "ponderhit"
+STOP = "stop"
+QUIT = "quit"
+
+
+class Request(NamedTuple):
+    id: int
+    command: str
+    fen: str = ""
+    moves: tuple[str, ...] = ()
+    depth: int = MAX_PLY
+    time_limit: float | None = None
+
+
+class Update(NamedTuple):
+    request: int
+    mode: str
+    final: bool
+    depth: int
+    score: int
+    nodes: int
+    nps: int
+    pv: list[str]
+
+
+def game_line(position: Position) -> tuple[str, tuple[str, ...]]:
+    root = position.copy()
+    while root.history:
+        root.unmake_move()
+    return root.fen(), tuple(undo.move.uci() for undo in position.history)
+
+
+class SearchState:
+    def __init__(self, request: Request):
+        self.request = request
+        self.mode = request.command
+        self.deadline: float | None = None
+        self.released = threading.Event()
+
+
+def hit(state: SearchState, time_limit: float | None) -> None:
+    state.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    state.mode = PLAY
+    state.released.set()
+
+
+def listen(commands: multiprocessing.Queue, pending: queue.Queue, lock: threading.Lock, engine: Engine, current: list[SearchState | None], hits: dict[int, float | None]) -> None:
+    while True:
+        request = commands.get()
+        with lock:
+            state = current[0]
+            if request.command == PONDERHIT:
+                if state is not None and state.request.id == request.id and state.mode == PONDER:
+                    hit(state, request.time_limit)
+                    engine.deadline = state.deadline
+                else:
+                    hits[request.id] = request.time_limit
+                continue
+            engine.stop_event.set()
+            if state is not None:
+                state.mode = STOP
+                state.released.set()
+            pending.put(request)
+        if request.command == QUIT:
+            return
+
+
+def run_worker(commands: multiprocessing.Queue, updates: multiprocessing.Queue, table_size: int, book_path: str | None) -> None:
+    engine = Engine(table_size, OpeningBook(book_path) if book_path is not None else None)
+    pending: queue.Queue[Request] = queue.Queue()
+    lock = threading.Lock()
+    engine.stop_event = threading.Event()
+    current: list[SearchState | None] = [None]
+    hits: dict[int, float | None] = {}
+    threading.Thread(target=listen, args=(commands, pending, lock, engine, current, hits), daemon=True).start()
+
+    while True:
+        request = pending.get()
+        if request.command == QUIT:
+            return
+        with lock:
+            if request.command == STOP or not pending.empty():
+                continue
+            engine.stop_event.clear()
+            state = SearchState(request)
+            current[0] = state
+            if request.id in hits:
+                hit(state, hits.pop(request.id))
+
+        position = Position()
+        position.load_fen(request.fen)
+        for text in request.moves:
+            position.make_move(position.parse_move(text))
+        sign = 1 if position.current_player == "W" else -1
+
+        def send(info: SearchInfo, final: bool = False) -> None:
+            if state.deadline is not None:
+                engine.deadline = state.deadline
+            if state.mode != STOP:
+                updates.put(Update(request.id, state.mode, final, info.depth, sign * info.score, info.nodes, info.nps, [move.uci() for move in info.pv]))
+
+        time_limit = request.time_limit if state.mode == PLAY and state.deadline is None else None
+        info = engine.search(position, request.depth, time_limit, None, send)
+        if state.mode == PONDER:
+            state.released.wait()
+        with lock:
+            current[0] = None
+        send(info, True)
+
+
+class AnalysisWorker:
+    def __init__(self, table_size: int = 1 << 18, book_path: str | None = None, notify: Callable[[], None] | None = None):
+        self.commands = multiprocessing.Queue()
+        self.updates = multiprocessing.Queue()
+        self.received: queue.Queue[Update] = queue.Queue()
+        self.notify = notify
+        self.ids = itertools.count(1)
+        self.request: Request | None = None
+        self.process = multiprocessing.Process(target=run_worker, args=(self.commands, self.updates, table_size, book_path), daemon=True)
+        self.process.start()
+        self.reader = threading.Thread(target=self.read, daemon=True)
+        self.reader.start()
+
+    def read(self) -> None:
+        while True:
+            update = self.updates.get()
+            if update is None:
+                return
+            self.received.put(update)
+            if self.notify is not None:
+                self.notify()
+
+    def submit(self, command: str, position: Position, depth: int, time_limit: float | None) -> int:
+        fen, moves = game_line(position)
+        self.request = Request(next(self.ids), command, fen, moves, depth, time_limit)
+        self.commands.put(self.request)
+        return self.request.id
+
+    def play(self, position: Position, time_limit: float | None = None, depth: int = MAX_PLY) -> int:
+        return self.submit(PLAY, position, depth, time_limit)
+
+    def ponder(self, position: Position, depth: int = MAX_PLY) -> int:
+        return self.submit(PONDER, position, depth, None)
+
+    def analyse(self, position: Position, depth: int = MAX_PLY) -> int:
+        return self.submit(ANALYSE, position, depth, None)
+
+    def ponderhit(self, time_limit: float | None) -> int:
+        self.request = self.request._replace(command=PLAY, time_limit=time_limit)
+        self.commands.put(Request(self.request.id, PONDERHIT, time_limit=time_limit))
+        return self.request.id
+
+    def cancel(self) -> None:
+        if self.request is not None:
+            self.commands.put(Request(self.request.id, STOP))
+            self.request = None
+
+    def poll(self) -> list[Update]:
+        updates = []
+        while True:
+            try:
+                update = self.received.get_nowait()
+            except queue.Empty:
+                return updates
+            if self.request is not None and update.request == self.request.id:
+                updates.append(update)
+
+    def close(self) -> None:
+        self.request = None
+        self.commands.put(Request(0, QUIT))
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.updates.put(None)
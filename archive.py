@@ -0,0 +1,212 @@
+import argparse
+import mmap
+import struct
+import sys
+import time
+from array import array
+from typing import Iterator, NamedTuple
+from move import Move
+from piece import PIECE_TYPES
+from pgn import RESULTS, read_games, write_game
+from position import Position
+from tables import COORDINATES
+
+MAGIC = b"PYCA"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHHIQ")
+GAME_HEADER = struct.Struct("<BBHI")
+OFFSET = struct.Struct("<Q")
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+PROMOTION_TYPES = {piece_type.kind: piece_type for piece_type in PIECE_TYPES}
+
+
+class ArchivedGame(NamedTuple):
+    headers: dict[str, str]
+    moves: list[Move]
+    result: str
+    fen: str | None
+
+
+def encode_move(move: Move) -> int:
+    code = (move.from_row * 8 + move.from_column) | (move.to_row * 8 + move.to_column) << 6
+    if move.promotion is not None:
+        code |= move.promotion.kind << 12
+    return code
+
+
+def decode_move(code: int) -> Move:
+    from_row, from_column = COORDINATES[code & 63]
+    to_row, to_column = COORDINATES[code >> 6 & 63]
+    promotion = code >> 12 & 7
+    return Move(from_row, from_column, to_row, to_column, PROMOTION_TYPES[promotion] if promotion else None)
+
+
+def encode_headers(headers: dict[str, str]) -> bytes:
+    return b"".join(name.encode() + b"\0" + value.encode() + b"\0" for name, value in headers.items())
+
+
+def decode_headers(data: bytes | memoryview) -> dict[str, str]:
+    fields = bytes(data).decode().split("\0")
+    return dict(zip(fields[0:-1:2], fields[1::2]))
+
+
+class ArchiveWriter:
+    def __init__(self, path: str):
+        self.file = open(path, "wb")
+        self.offsets: list[int] = []
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(self, headers: dict[str, str], moves: list[Move], result: str = "*", fen: str | None = None) -> int:
+        if fen is not None:
+            headers = {**headers, "FEN": fen}
+        metadata = encode_headers(headers)
+        codes = array("H", [encode_move(move) for move in moves])
+        if sys.byteorder == "big":
+            codes.byteswap()
+
+        self.offsets.append(self.file.tell())
+        self.file.write(GAME_HEADER.pack(RESULTS.index(result), 1 if fen is not None else 0, len(codes), len(metadata)))
+        self.file.write(metadata)
+        self.file.write(codes.tobytes())
+        return len(self.offsets) - 1
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        index_offset = self.file.tell()
+        self.file.write(b"".join(OFFSET.pack(offset) for offset in self.offsets))
+        self.file.seek(0)
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, len(self.offsets), index_offset))
+        self.file.close()
+
+
+class ArchiveReader:
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count, self.index_offset = FILE_HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a game archive: {path}")
+        self.view = memoryview(self.buffer)
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> ArchivedGame:
+        headers, result, codes = self.record(index)
+        return ArchivedGame(headers, [decode_move(code) for code in codes], result, headers.get("FEN"))
+
+    def __iter__(self) -> Iterator[ArchivedGame]:
+        for index in range(self.count):
+            yield self[index]
+
+    def close(self) -> None:
+        if hasattr(self, "view"):
+            self.view.release()
+        try:
+            self.buffer.close()
+        except BufferError:
+            pass
+        self.file.close()
+
+    def offset(self, index: int) -> int:
+        if not 0 <= index < self.count:
+            raise IndexError(f"game {index} out of range")
+        return OFFSET.unpack_from(self.buffer, self.index_offset + index * OFFSET.size)[0]
+
+    def move_codes(self, index: int) -> memoryview | array:
+        offset = self.offset(index)
+        _, _, plies, metadata_length = GAME_HEADER.unpack_from(self.buffer, offset)
+        start = offset + GAME_HEADER.size + metadata_length
+        codes = self.view[start:start + plies * 2]
+        if sys.byteorder == "big":
+            swapped = array("H", codes)
+            swapped.byteswap()
+            return swapped
+        return codes.cast("H")
+
+    def result(self, index: int) -> str:
+        return RESULTS[self.buffer[self.offset(index)]]
+
+    def record(self, index: int) -> tuple[dict[str, str], str, memoryview | array]:
+        offset = self.offset(index)
+        result, _, _, metadata_length = GAME_HEADER.unpack_from(self.buffer, offset)
+        start = offset + GAME_HEADER.size
+        return decode_headers(self.view[start:start + metadata_length]), RESULTS[result], self.move_codes(index)
+
+    def replay(self, index: int, position: Position | None = None) -> Position:
+        headers, _, codes = self.record(index)
+        if position is None:
+            position = Position()
+        position.load_fen(headers.get("FEN", START_FEN))
+        for code in codes:
+            position.make_move(decode_move(code))
+        return position
+
+
+def pack(source: str, destination: str) -> dict[str, int | float]:
+    start = time.perf_counter()
+    games = skipped = 0
+    with open(source, encoding="utf-8", errors="replace") as file, ArchiveWriter(destination) as writer:
+        for game in read_games(file):
+            if game.error is not None:
+                skipped += 1
+                continue
+            headers = {name: value for name, value in game.headers.items() if name not in ("FEN", "SetUp", "Result")}
+            writer.add(headers, game.moves, game.result, game.headers.get("FEN"))
+            games += 1
+    return {"games": games, "skipped": skipped, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def scan(path: str) -> dict[str, int | float | dict[str, int]]:
+    start = time.perf_counter()
+    results = {result: 0 for result in RESULTS}
+    plies = 0
+    with ArchiveReader(path) as reader:
+        for index in range(len(reader)):
+            results[reader.result(index)] += 1
+            plies += len(reader.move_codes(index))
+        games = len(reader)
+    return {"games": games, "plies": plies, "results": results, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pack PGN files into a binary game archive and read them back.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    pack_parser = subparsers.add_parser("pack", help="convert a PGN file into an archive")
+    pack_parser.add_argument("source", help="PGN file to read")
+    pack_parser.add_argument("destination", help="archive file to write")
+    scan_parser = subparsers.add_parser("scan", help="count games, plies and results")
+    scan_parser.add_argument("path", help="archive file")
+    show_parser = subparsers.add_parser("show", help="print one game as PGN")
+    show_parser.add_argument("path", help="archive file")
+    show_parser.add_argument("index", type=int, help="game number, starting at 0")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        print(" ".join(f"{name} {value}" for name, value in pack(args.source, args.destination).items()))
+    elif args.command == "scan":
+        print(" ".join(f"{name} {value}" for name, value in scan(args.path).items()))
+    else:
+        with ArchiveReader(args.path) as reader:
+            game = reader[args.index]
+        headers = {name: value for name, value in game.headers.items() if name != "FEN"}
+        print(write_game(headers, game.moves, game.result, game.fen), end="")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
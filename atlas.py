@@ -0,0 +1,77 @@
+import os
+import pygame
+
+ASSET_DIRECTORY = "assets"
+CACHE_DIRECTORY = os.path.join(ASSET_DIRECTORY, ".cache")
+DEFAULT_THEME = "default"
+SPRITE_NAMES = [f"{color}_{name}" for color in "WB" for name in ("King", "Queen", "Rook", "Bishop", "Knight", "Pawn")]
+SPRITE_SCALE = 0.64
+SPRITE_TOP = 0.125
+
+
+class SpriteAtlas:
+    def __init__(self, surface: pygame.Surface, tile_size: int):
+        self.surface = surface
+        self.tile_size = tile_size
+        self.sprite_size = sprite_size(tile_size)
+        self.rects = {name: pygame.Rect(index * self.sprite_size, 0, self.sprite_size, self.sprite_size) for index, name in enumerate(SPRITE_NAMES)}
+        self.offset = (tile_size - self.sprite_size) // 2, round(tile_size * SPRITE_TOP)
+        self.sprites: dict[str, pygame.Surface] = {}
+
+    def __getitem__(self, name: str) -> pygame.Surface:
+        if name not in self.sprites:
+            self.sprites[name] = self.surface.subsurface(self.rects[name])
+        return self.sprites[name]
+
+    def blit(self, screen: pygame.SurfaceType, name: str, row: int, column: int) -> None:
+        position = self.tile_size * column + self.offset[0], self.tile_size * row + self.offset[1]
+        screen.blit(self.surface, position, self.rects[name])
+
+
+ATLASES: dict[tuple[str, int], SpriteAtlas] = {}
+
+
+def sprite_size(tile_size: int) -> int:
+    return max(round(tile_size * SPRITE_SCALE), 1)
+
+
+def theme_directory(theme: str) -> str:
+    return ASSET_DIRECTORY if theme == DEFAULT_THEME else os.path.join(ASSET_DIRECTORY, theme)
+
+
+def cache_path(theme: str, tile_size: int) -> str:
+    return os.path.join(CACHE_DIRECTORY, f"{theme}_{tile_size}.png")
+
+
+def source_paths(theme: str) -> list[str]:
+    return [os.path.join(theme_directory(theme), name + ".png") for name in SPRITE_NAMES]
+
+
+def build_atlas(theme: str, tile_size: int) -> pygame.Surface:
+    size = sprite_size(tile_size)
+    surface = pygame.Surface((size * len(SPRITE_NAMES), size), pygame.SRCALPHA)
+    for index, path in enumerate(source_paths(theme)):
+        surface.blit(pygame.transform.smoothscale(pygame.image.load(path), (size, size)), (index * size, 0))
+    return surface
+
+
+def load_atlas(tile_size: int, theme: str = DEFAULT_THEME) -> SpriteAtlas:
+    if (theme, tile_size) in ATLASES:
+        return ATLASES[(theme, tile_size)]
+
+    path = cache_path(theme, tile_size)
+    sources = source_paths(theme)
+    if os.path.exists(path) and os.path.getmtime(path) >= max(os.path.getmtime(source) for source in sources):
+        surface = pygame.image.load(path)
+    else:
+        surface = build_atlas(theme, tile_size)
+        try:
+            os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+            pygame.image.save(surface, path)
+        except (OSError, pygame.error):
+            pass
+
+    if pygame.display.get_surface() is not None:
+        surface = surface.convert_alpha()
+    ATLASES[(theme, tile_size)] = SpriteAtlas(surface, tile_size)
+    return ATLASES[(theme, tile_size)]
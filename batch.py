@@ -0,0 +1,163 @@
+import argparse
+import random
+import time
+from typing import Sequence
+from evaluation import VALUE_TABLE, MOBILITY_WEIGHTS, DOUBLED_PAWN, ISOLATED_PAWN, PASSED_PAWN, evaluate
+from piece import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, BLACK
+from position import Position
+from tables import ROOK_DIRECTIONS, BISHOP_DIRECTIONS, KNIGHT_TARGETS, RAYS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PADDING = 64
+
+
+def build_tables() -> dict:
+    knight_targets = np.full((64, 8), PADDING, dtype=np.intp)
+    for square, targets in enumerate(KNIGHT_TARGETS):
+        knight_targets[square, :len(targets)] = targets
+
+    rays = {}
+    for direction, direction_rays in RAYS.items():
+        table = np.full((64, 7), PADDING, dtype=np.intp)
+        for square, ray in enumerate(direction_rays):
+            table[square, :len(ray)] = ray
+        rays[direction] = table
+
+    passed = np.zeros((2, 8, 8), dtype=np.int32)
+    for row in range(8):
+        passed[0, row, :] = PASSED_PAWN[row]
+        passed[1, row, :] = PASSED_PAWN[7 - row]
+
+    return {
+        "values": np.array(VALUE_TABLE, dtype=np.int32),
+        "knight_targets": knight_targets,
+        "rays": rays,
+        "passed": passed,
+    }
+
+
+TABLES = build_tables() if np is not None else None
+
+
+def pack(positions: Sequence[Position]) -> tuple["np.ndarray", "np.ndarray"]:
+    codes = np.frombuffer(b"".join(bytes(position.squares) for position in positions), dtype=np.int8).reshape(len(positions), 64)
+    black_to_move = np.array([position.current_player == "B" for position in positions], dtype=bool)
+    return codes, black_to_move
+
+
+def material_batch(codes: "np.ndarray") -> "np.ndarray":
+    return TABLES["values"][codes, np.arange(64)].sum(axis=1)
+
+
+def mobility_batch(codes: "np.ndarray") -> "np.ndarray":
+    count = len(codes)
+    occupied = np.ones((count, 65), dtype=bool)
+    occupied[:, :64] = codes != 0
+    black = np.zeros((count, 65), dtype=bool)
+    black[:, :64] = codes >= BLACK
+    white = occupied & ~black
+    white[:, PADDING] = False
+    kinds = codes & 7
+    sign = np.where(codes >= BLACK, -1, 1)
+    score = np.zeros(count, dtype=np.int64)
+
+    rows, squares = np.nonzero(kinds == KNIGHT)
+    targets = TABLES["knight_targets"][squares]
+    own = np.where((codes[rows, squares] >= BLACK)[:, None], black[rows[:, None], targets], white[rows[:, None], targets])
+    moves = ((targets != PADDING) & ~own).sum(axis=1)
+    score += np.bincount(rows, moves * sign[rows, squares] * MOBILITY_WEIGHTS[KNIGHT], minlength=count).astype(np.int64)
+
+    for kind, directions in ((BISHOP, BISHOP_DIRECTIONS), (ROOK, ROOK_DIRECTIONS), (QUEEN, BISHOP_DIRECTIONS + ROOK_DIRECTIONS)):
+        rows, squares = np.nonzero(kinds == kind)
+        moves = np.zeros(len(rows), dtype=np.int64)
+        for direction in directions:
+            ray = TABLES["rays"][direction][squares]
+            blocked = occupied[rows[:, None], ray]
+            free_before = np.ones_like(blocked)
+            free_before[:, 1:] = np.logical_and.accumulate(~blocked[:, :-1], axis=1)
+            moves += ((ray != PADDING) & free_before).sum(axis=1)
+        score += np.bincount(rows, moves * sign[rows, squares] * MOBILITY_WEIGHTS[kind], minlength=count).astype(np.int64)
+    return score
+
+
+def pawn_structure_batch(codes: "np.ndarray") -> "np.ndarray":
+    boards = codes.reshape(len(codes), 8, 8)
+    score = np.zeros(len(codes), dtype=np.int32)
+    pawns = {0: boards == PAWN, 1: boards == (PAWN | BLACK)}
+
+    for color, sign in ((0, 1), (1, -1)):
+        own = pawns[color]
+        enemy = pawns[1 - color]
+        files = own.sum(axis=1)
+        score -= sign * DOUBLED_PAWN * np.clip(files - 1, 0, None).sum(axis=1)
+
+        neighbours = np.zeros_like(files)
+        neighbours[:, 1:] += files[:, :-1]
+        neighbours[:, :-1] += files[:, 1:]
+        score -= sign * ISOLATED_PAWN * np.where(neighbours == 0, files, 0).sum(axis=1)
+
+        span = enemy.copy()
+        span[:, :, 1:] |= enemy[:, :, :-1]
+        span[:, :, :-1] |= enemy[:, :, 1:]
+        blocked = np.zeros_like(span)
+        if color == 0:
+            blocked[:, 1:, :] = np.logical_or.accumulate(span, axis=1)[:, :-1, :]
+        else:
+            blocked[:, :-1, :] = np.logical_or.accumulate(span[:, ::-1, :], axis=1)[:, ::-1, :][:, 1:, :]
+        score += sign * (np.where(own & ~blocked, TABLES["passed"][color], 0)).sum(axis=(1, 2))
+    return score
+
+
+def evaluate_batch(positions: Sequence[Position]) -> list[int]:
+    if np is None:
+        return [evaluate(position) for position in positions]
+    codes, black_to_move = pack(positions)
+    return evaluate_codes(codes, black_to_move).tolist()
+
+
+def evaluate_codes(codes: "np.ndarray", black_to_move: "np.ndarray") -> "np.ndarray":
+    codes = codes.astype(np.intp)
+    score = material_batch(codes) + mobility_batch(codes) + pawn_structure_batch(codes)
+    return np.where(black_to_move, -score, score)
+
+
+def random_positions(count: int, plies: int, seed: int) -> list[Position]:
+    generator = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        position = Position()
+        for _ in range(generator.randint(0, plies)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make_move(generator.choice(moves))
+        positions.append(position)
+    return positions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare batch and scalar evaluation speed and results.")
+    parser.add_argument("--positions", type=int, default=2000, help="number of random positions")
+    parser.add_argument("--plies", type=int, default=60, help="maximum random plies per position")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    positions = random_positions(args.positions, args.plies, args.seed)
+    start = time.perf_counter()
+    scalar = [evaluate(position) for position in positions]
+    scalar_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = evaluate_batch(positions)
+    batch_seconds = time.perf_counter() - start
+
+    print(f"backend {'numpy' if np is not None else 'scalar'} positions {len(positions)} identical {scalar == batch}")
+    print(f"scalar {int(len(positions) / scalar_seconds)} positions/s batch {int(len(positions) / batch_seconds)} positions/s")
+    return 0 if scalar == batch else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
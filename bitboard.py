@@ -0,0 +1,224 @@
+from typing import Iterator
+from move import Move
+from piece import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, TYPE_MASK, color_bit
+from position import COLORS, PROMOTIONS, Position
+from tables import COORDINATES, ROOK_DIRECTIONS, BISHOP_DIRECTIONS, KING_DIRECTIONS, KNIGHT_TARGETS, KING_TARGETS, RAYS, PAWN_CAPTURES
+
+
+def square(row: int, column: int) -> int:
+    return row * 8 + column
+
+
+def to_mask(targets: list[int]) -> int:
+    mask = 0
+    for target in targets:
+        mask |= 1 << target
+    return mask
+
+
+FULL = (1 << 64) - 1
+PROMOTION_RANKS = 0xFF | 0xFF << 56
+KNIGHT_ATTACKS = [to_mask(targets) for targets in KNIGHT_TARGETS]
+KING_ATTACKS = [to_mask(targets) for targets in KING_TARGETS]
+PAWN_ATTACKS = {color: [to_mask(targets) for targets in PAWN_CAPTURES[color]] for color in "WB"}
+MOVES = [[Move(*COORDINATES[origin], *COORDINATES[target]) for target in range(64)] for origin in range(64)]
+RAY_MASKS = {direction: [to_mask(ray) for ray in RAYS[direction]] for direction in KING_DIRECTIONS}
+
+
+def build_between() -> list[list[int]]:
+    between = [[0] * 64 for _ in range(64)]
+    for origin in range(64):
+        for direction in KING_DIRECTIONS:
+            mask = 0
+            for target in RAYS[direction][origin]:
+                between[origin][target] = mask
+                mask |= 1 << target
+    return between
+
+
+BETWEEN = build_between()
+ROOK_RAYS_MASKS = [RAY_MASKS[(0, 1)][index] | RAY_MASKS[(0, -1)][index] | RAY_MASKS[(1, 0)][index] | RAY_MASKS[(-1, 0)][index] for index in range(64)]
+BISHOP_RAYS_MASKS = [RAY_MASKS[(1, 1)][index] | RAY_MASKS[(1, -1)][index] | RAY_MASKS[(-1, 1)][index] | RAY_MASKS[(-1, -1)][index] for index in range(64)]
+
+
+def sliding_attacks(index: int, occupied: int, directions: list[tuple[int, int]]) -> int:
+    attacks = 0
+    for direction in directions:
+        ray = RAY_MASKS[direction][index]
+        blockers = ray & occupied
+        if blockers:
+            if direction[0] * 8 + direction[1] > 0:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAY_MASKS[direction][blocker]
+        attacks |= ray
+    return attacks
+
+
+class BitboardPosition(Position):
+    def __init__(self, current_player: str = "W"):
+        self.bitboards: list[int] = [0] * 16
+        self.occupancy: dict[str, int] = {"W": 0, "B": 0}
+
+        super().__init__(current_player)
+
+    @property
+    def occupied(self) -> int:
+        return self.occupancy["W"] | self.occupancy["B"]
+
+    def copy(self) -> "BitboardPosition":
+        position = super().copy()
+        position.bitboards = self.bitboards[:]
+        position.occupancy = dict(self.occupancy)
+        return position
+
+    def set_code(self, code: int, index: int) -> None:
+        bit = 1 << index
+        old_code = self.squares[index]
+        if old_code:
+            self.bitboards[old_code] &= ~bit
+            self.occupancy[COLORS[old_code >> 3]] &= ~bit
+        if code:
+            self.bitboards[code] |= bit
+            self.occupancy[COLORS[code >> 3]] |= bit
+        super().set_code(code, index)
+
+    def attackers(self, row: int, column: int, by_color: str, occupied: int | None = None) -> int:
+        index = square(row, column)
+        if occupied is None:
+            occupied = self.occupied
+        other = "B" if by_color == "W" else "W"
+        color = color_bit(by_color)
+        bitboards = self.bitboards
+        queens = bitboards[QUEEN | color]
+
+        result = PAWN_ATTACKS[other][index] & bitboards[PAWN | color]
+        result |= KNIGHT_ATTACKS[index] & bitboards[KNIGHT | color]
+        result |= KING_ATTACKS[index] & bitboards[KING | color]
+        result |= sliding_attacks(index, occupied, ROOK_DIRECTIONS) & (bitboards[ROOK | color] | queens)
+        result |= sliding_attacks(index, occupied, BISHOP_DIRECTIONS) & (bitboards[BISHOP | color] | queens)
+        return result
+
+    def is_square_attacked(self, row: int, column: int, by_color: str, ignore: tuple[tuple[int, int], ...] = (), block: tuple[tuple[int, int], ...] = ()) -> bool:
+        ignored = 0
+        for ignore_row, ignore_column in ignore:
+            ignored |= 1 << square(ignore_row, ignore_column)
+        blocked = 0
+        for block_row, block_column in block:
+            blocked |= 1 << square(block_row, block_column)
+        return self.attackers(row, column, by_color, (self.occupied & ~ignored) | blocked) & ~ignored != 0
+
+    def check_and_pins(self, king: int) -> tuple[int | None, dict[int, int]]:
+        color = self.current_player
+        enemy = "B" if color == "W" else "W"
+        bitboards = self.bitboards
+        own = self.occupancy[color]
+        occupied = own | self.occupancy[enemy]
+        enemy_bit = color_bit(enemy)
+        queens = bitboards[QUEEN | enemy_bit]
+
+        checkers = self.attackers(*COORDINATES[king], enemy)
+        check_mask = None
+        if checkers:
+            checker = checkers.bit_length() - 1
+            check_mask = 0 if checkers & (checkers - 1) else checkers | BETWEEN[king][checker]
+
+        pins = {}
+        snipers = (ROOK_RAYS_MASKS[king] & (bitboards[ROOK | enemy_bit] | queens)) | (BISHOP_RAYS_MASKS[king] & (bitboards[BISHOP | enemy_bit] | queens))
+        while snipers:
+            bit = snipers & -snipers
+            snipers ^= bit
+            sniper = bit.bit_length() - 1
+            blockers = BETWEEN[king][sniper] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pins[blockers.bit_length() - 1] = BETWEEN[king][sniper] | bit
+        return check_mask, pins
+
+    def moves_mask(self, index: int) -> int:
+        code = self.squares[index]
+        kind = code & TYPE_MASK
+        color = COLORS[code >> 3]
+        own = self.occupancy[color]
+        occupied = own | self.occupancy["B" if color == "W" else "W"]
+
+        if kind == PAWN:
+            forward = -8 if color == "W" else 8
+            mask = PAWN_ATTACKS[color][index] & occupied & ~own
+            single = index + forward
+            if 0 <= single < 64 and not occupied >> single & 1:
+                mask |= 1 << single
+                double = single + forward
+                if index >> 3 == (6 if color == "W" else 1) and not occupied >> double & 1:
+                    mask |= 1 << double
+            return mask
+        if kind == KNIGHT:
+            return KNIGHT_ATTACKS[index] & ~own
+        if kind == KING:
+            return KING_ATTACKS[index] & ~own
+        if kind == ROOK:
+            return sliding_attacks(index, occupied, ROOK_DIRECTIONS) & ~own
+        if kind == BISHOP:
+            return sliding_attacks(index, occupied, BISHOP_DIRECTIONS) & ~own
+        if kind == QUEEN:
+            return sliding_attacks(index, occupied, KING_DIRECTIONS) & ~own
+        return 0
+
+    def iter_legal_moves(self, origins: range | list[int] = range(64)) -> Iterator[Move]:
+        color = self.current_player
+        enemy = "B" if color == "W" else "W"
+        enemy_attacks = self.attack_map[enemy]
+        king = self.king_squares[color]
+        check_mask, pins = self.check_and_pins(king) if king >= 0 else (None, {})
+        allowed = check_mask if check_mask is not None else FULL
+        en_passant = square(*self.en_passant) if self.en_passant is not None else -1
+        pieces = self.occupancy[color] if origins == range(64) else self.occupancy[color] & to_mask(origins)
+
+        while pieces:
+            lowest = pieces & -pieces
+            pieces ^= lowest
+            index = lowest.bit_length() - 1
+            kind = self.squares[index] & TYPE_MASK
+            row, column = COORDINATES[index]
+
+            if kind == KING:
+                targets = self.moves_mask(index)
+                while targets:
+                    bit = targets & -targets
+                    targets ^= bit
+                    target = bit.bit_length() - 1
+                    if enemy_attacks[target]:
+                        continue
+                    if check_mask is not None and self.is_square_attacked(*COORDINATES[target], enemy, ignore=((row, column),)):
+                        continue
+                    yield MOVES[index][target]
+                if check_mask is None:
+                    if self.can_castle("king"):
+                        yield Move(row, column, row, 6)
+                    if self.can_castle("queen"):
+                        yield Move(row, column, row, 2)
+                continue
+
+            if not allowed:
+                continue
+            pin = pins.get(index, FULL)
+            targets = self.moves_mask(index) & allowed & pin
+            if kind == PAWN:
+                if en_passant >= 0 and PAWN_ATTACKS[color][index] >> en_passant & 1 and pin >> en_passant & 1:
+                    new_row, new_column = COORDINATES[en_passant]
+                    king_row, king_column = COORDINATES[king] if king >= 0 else (-1, -1)
+                    if king < 0 or not self.is_square_attacked(king_row, king_column, enemy, ignore=((row, column), (row, new_column)), block=((new_row, new_column),)):
+                        targets |= 1 << en_passant
+            moves = MOVES[index]
+            if kind == PAWN and targets & PROMOTION_RANKS:
+                while targets:
+                    bit = targets & -targets
+                    targets ^= bit
+                    new_row, new_column = COORDINATES[bit.bit_length() - 1]
+                    for promotion in PROMOTIONS:
+                        yield Move(row, column, new_row, new_column, promotion)
+                continue
+            while targets:
+                bit = targets & -targets
+                targets ^= bit
+                yield moves[bit.bit_length() - 1]
@@ -0,0 +1,166 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+from typing import Iterable, NamedTuple
+from archive import ArchiveReader, decode_move, encode_move
+from move import Move
+from pgn import read_games
+from position import Position
+
+ENTRY = struct.Struct(">QHHI")
+MAX_WEIGHT = 0xFFFF
+
+
+class BookEntry(NamedTuple):
+    move: Move
+    weight: int
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size % ENTRY.size != 0:
+            self.file.close()
+            raise ValueError(f"Not an opening book: {path}")
+        self.count = size // ENTRY.size
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else None
+
+    def __enter__(self) -> "OpeningBook":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        if self.buffer is not None:
+            self.buffer.close()
+        self.file.close()
+
+    def lower_bound(self, key: int) -> int:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.buffer, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, key: int) -> list[tuple[int, int]]:
+        entries = []
+        index = self.lower_bound(key)
+        while index < self.count:
+            entry_key, code, weight, _ = ENTRY.unpack_from(self.buffer, index * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((code, weight))
+            index += 1
+        return entries
+
+    def entries(self, position: Position) -> list[BookEntry]:
+        legal_moves = position.legal_moves()
+        entries = []
+        for code, weight in self.lookup(position.key):
+            move = decode_move(code)
+            if move in legal_moves:
+                entries.append(BookEntry(move, weight))
+        return entries
+
+    def choose(self, position: Position, generator: random.Random | None = None) -> Move | None:
+        entries = [entry for entry in self.entries(position) if entry.weight > 0]
+        if not entries:
+            return None
+        if generator is None:
+            return max(entries, key=lambda entry: entry.weight).move
+        return generator.choices([entry.move for entry in entries], [entry.weight for entry in entries])[0]
+
+
+def collect(games: Iterable[tuple[str | None, list[Move], str]], plies: int) -> dict[tuple[int, int], int]:
+    scores: dict[tuple[int, int], int] = {}
+    for fen, moves, result in games:
+        position = Position()
+        if fen is not None:
+            position.load_fen(fen)
+        for move in moves[:plies]:
+            mover = position.current_player
+            if result == "1/2-1/2":
+                score = 1
+            elif result == ("1-0" if mover == "W" else "0-1"):
+                score = 2
+            else:
+                score = 0
+            entry = (position.key, encode_move(move))
+            scores[entry] = scores.get(entry, 0) + score
+            position.make_move(move)
+    return scores
+
+
+def write_book(path: str, scores: dict[tuple[int, int], int], minimum: int = 1) -> int:
+    largest = max(scores.values(), default=0)
+    scale = MAX_WEIGHT / largest if largest > MAX_WEIGHT else 1
+    entries = sorted((key, code, max(int(score * scale), 1)) for (key, code), score in scores.items() if score >= minimum)
+    with open(path, "wb") as file:
+        for key, code, weight in entries:
+            file.write(ENTRY.pack(key, code, weight, 0))
+    return len(entries)
+
+
+def archive_games(path: str) -> Iterable[tuple[str | None, list[Move], str]]:
+    with ArchiveReader(path) as reader:
+        for game in reader:
+            yield game.fen, game.moves, game.result
+
+
+def pgn_games(path: str) -> Iterable[tuple[str | None, list[Move], str]]:
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for game in read_games(file):
+            if game.error is None:
+                yield game.headers.get("FEN"), game.moves, game.result
+
+
+def build(sources: list[str], destination: str, plies: int = 24, minimum: int = 1) -> dict[str, int | float]:
+    start = time.perf_counter()
+    scores: dict[tuple[int, int], int] = {}
+    for source in sources:
+        games = pgn_games(source) if source.endswith(".pgn") else archive_games(source)
+        for entry, score in collect(games, plies).items():
+            scores[entry] = scores.get(entry, 0) + score
+    entries = write_book(destination, scores, minimum)
+    return {"entries": entries, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build and query opening books.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="build a book from game archives or PGN files")
+    build_parser.add_argument("sources", nargs="+", help="archives (.pca) or PGN files (.pgn)")
+    build_parser.add_argument("--output", required=True, help="book file to write")
+    build_parser.add_argument("--plies", type=int, default=24, help="plies per game to include")
+    build_parser.add_argument("--min-score", type=int, default=1, help="drop moves scoring below this")
+    probe_parser = subparsers.add_parser("probe", help="list book moves for a position")
+    probe_parser.add_argument("path", help="book file")
+    probe_parser.add_argument("--fen", default=None, help="position to look up (defaults to the start position)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(" ".join(f"{name} {value}" for name, value in build(args.sources, args.output, args.plies, args.min_score).items()))
+        return 0
+
+    position = Position()
+    if args.fen is not None:
+        position.load_fen(args.fen)
+    with OpeningBook(args.path) as book:
+        for entry in sorted(book.entries(position), key=lambda entry: entry.weight, reverse=True):
+            print(f"{position.san(entry.move)} {entry.move.uci()} {entry.weight}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
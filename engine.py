@@ -0,0 +1,360 @@
+import argparse
+import multiprocessing.synchronize
+import threading
+import time
+import profiler
+from typing import Callable, NamedTuple
+from book import OpeningBook
+from evaluation import PIECE_VALUES, evaluate
+from move import Move
+from piece import PAWN, TYPE_MASK
+from position import Position
+from tablebase import Tablebase
+
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+MAX_PLY = 128
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class TableEntry(NamedTuple):
+    key: int
+    depth: int
+    score: int
+    flag: int
+    move: Move | None
+    generation: int
+
+
+class TranspositionTable:
+    def __init__(self, size: int = 1 << 18):
+        self.size = size
+        self.entries: list[TableEntry | None] = [None] * size
+        self.generation = 0
+
+    def probe(self, key: int) -> TableEntry | None:
+        entry = self.entries[key % self.size]
+        if entry is not None and entry.key == key:
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: int, flag: int, move: Move | None) -> None:
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is None or entry.key == key or entry.generation != self.generation or depth >= entry.depth:
+            if move is None and entry is not None and entry.key == key:
+                move = entry.move
+            self.entries[index] = TableEntry(key, depth, score, flag, move, self.generation)
+
+    def new_search(self) -> None:
+        self.generation += 1
+
+    def clear(self) -> None:
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def resize(self, size: int) -> None:
+        self.size = size
+        self.clear()
+
+    def hashfull(self) -> int:
+        sample = self.entries[:1000]
+        return sum(1 for entry in sample if entry is not None and entry.generation == self.generation) * 1000 // max(len(sample), 1)
+
+
+class SearchInfo(NamedTuple):
+    depth: int
+    score: int
+    nodes: int
+    seconds: float
+    nps: int
+    pv: list[Move]
+
+    @property
+    def move(self) -> Move | None:
+        return self.pv[0] if self.pv else None
+
+
+class SearchStopped(Exception):
+    pass
+
+
+class Engine:
+    def __init__(self, table_size: int = 1 << 18, book: OpeningBook | None = None, tablebase: Tablebase | None = None):
+        self.table = TranspositionTable(table_size)
+        self.book = book
+        self.tablebase = tablebase
+        self.stopped = False
+        self.stop_event: threading.Event | multiprocessing.synchronize.Event | None = None
+        self.nodes = 0
+        self.node_limit: int | None = None
+        self.deadline: float | None = None
+        self.killers: list[list[Move | None]] = []
+        self.history: dict[tuple[int, int, int, int], int] = {}
+
+    def stop(self) -> None:
+        self.stopped = True
+
+    def search(self, position: Position, depth: int = MAX_PLY, time_limit: float | None = None, node_limit: int | None = None, callback: Callable[[SearchInfo], None] | None = None, single_move_exit: bool = True) -> SearchInfo:
+        start = time.perf_counter()
+        self.stopped = False
+        self.nodes = 0
+        self.node_limit = node_limit
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = {}
+        self.table.new_search()
+
+        root_moves = position.legal_moves()
+        best = SearchInfo(0, 0, 0, 0.0, 0, root_moves[:1])
+        if len(root_moves) == 0:
+            return best
+        if self.book is not None:
+            book_move = self.book.choose(position)
+            if book_move is not None:
+                return best._replace(pv=[book_move])
+
+        base = len(position.history)
+        for current_depth in range(1, min(depth, MAX_PLY) + 1):
+            try:
+                score = self.negamax(position, current_depth, -INFINITY, INFINITY, 0)
+            except SearchStopped:
+                while len(position.history) > base:
+                    position.unmake_move()
+                break
+
+            elapsed = time.perf_counter() - start
+            pv = self.principal_variation(position, current_depth)
+            if len(pv) == 0:
+                pv = best.pv
+            best = SearchInfo(current_depth, score, self.nodes, elapsed, int(self.nodes / elapsed) if elapsed > 0 else 0, pv)
+            if callback is not None:
+                callback(best)
+
+            if (single_move_exit and len(root_moves) == 1) or abs(score) >= MATE_BOUND:
+                break
+            if time_limit is not None and elapsed > time_limit / 2:
+                break
+
+        elapsed = time.perf_counter() - start
+        return best._replace(nodes=self.nodes, seconds=elapsed, nps=int(self.nodes / elapsed) if elapsed > 0 else 0)
+
+    def check_limits(self) -> None:
+        if self.stopped or (self.stop_event is not None and self.stop_event.is_set()):
+            raise SearchStopped()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchStopped()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchStopped()
+
+    def negamax(self, position: Position, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+
+        if ply > 0 and (position.is_fifty_move_rule() or position.repetition_count() > 1):
+            return 0
+        if ply >= MAX_PLY:
+            return evaluate(position)
+        if ply > 0 and self.tablebase is not None and 64 - position.squares.count(0) <= self.tablebase.max_men:
+            result = self.tablebase.probe(position)
+            if result is not None:
+                outcome, distance = result
+                return outcome * (MATE_SCORE - ply - distance)
+
+        in_check = position.is_checked()
+        if in_check:
+            depth += 1
+        if depth <= 0:
+            return self.quiescence(position, alpha, beta, ply)
+
+        original_alpha = alpha
+        table_move = None
+        entry = self.table.probe(position.key)
+        if entry is not None:
+            table_move = entry.move
+            if ply > 0 and entry.depth >= depth:
+                score = score_from_table(entry.score, ply)
+                if entry.flag == EXACT:
+                    return score
+                if entry.flag == LOWER:
+                    alpha = max(alpha, score)
+                elif entry.flag == UPPER:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        moves = position.legal_moves()
+        if len(moves) == 0:
+            return -MATE_SCORE + ply if in_check else 0
+        moves.sort(key=lambda move: self.move_order(position, move, table_move, ply), reverse=True)
+
+        best_score = -INFINITY
+        best_move = None
+        for move in moves:
+            capture = is_capture(position, move)
+            position.make_move(move)
+            score = -self.negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not capture and move.promotion is None:
+                            self.store_killer(move, ply)
+                            self.history[move[:4]] = self.history.get(move[:4], 0) + depth * depth
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(position.key, depth, score_to_table(best_score, ply), flag, best_move)
+        return best_score
+
+    def quiescence(self, position: Position, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+        if ply >= MAX_PLY:
+            return evaluate(position)
+        if ply > 0 and self.tablebase is not None and 64 - position.squares.count(0) <= self.tablebase.max_men:
+            result = self.tablebase.probe(position)
+            if result is not None:
+                outcome, distance = result
+                return outcome * (MATE_SCORE - ply - distance)
+
+        in_check = position.is_checked()
+        moves = position.legal_moves()
+        if in_check:
+            if len(moves) == 0:
+                return -MATE_SCORE + ply
+            best_score = -INFINITY
+        else:
+            best_score = evaluate(position)
+            if best_score >= beta:
+                return best_score
+            alpha = max(alpha, best_score)
+            moves = [move for move in moves if move.promotion is not None or is_capture(position, move)]
+
+        moves.sort(key=lambda move: self.move_order(position, move, None, ply), reverse=True)
+        for move in moves:
+            position.make_move(move)
+            score = -self.quiescence(position, -beta, -alpha, ply + 1)
+            position.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def move_order(self, position: Position, move: Move, table_move: Move | None, ply: int) -> int:
+        if move == table_move:
+            return 1000000
+        if is_capture(position, move):
+            victim = position.get_piece(move.to_row, move.to_column)
+            attacker = position.get_piece(move.from_row, move.from_column)
+            victim_value = PIECE_VALUES[victim.symbol] if victim is not None else PIECE_VALUES["P"]
+            return 100000 + victim_value * 10 - PIECE_VALUES[attacker.symbol] // 10
+        if move.promotion is not None:
+            return 90000 + PIECE_VALUES[move.promotion.symbol]
+        if move == self.killers[ply][0]:
+            return 80001
+        if move == self.killers[ply][1]:
+            return 80000
+        return self.history.get(move[:4], 0)
+
+    def store_killer(self, move: Move, ply: int) -> None:
+        if self.killers[ply][0] != move:
+            self.killers[ply][1] = self.killers[ply][0]
+            self.killers[ply][0] = move
+
+    def principal_variation(self, position: Position, depth: int) -> list[Move]:
+        pv = []
+        seen = set()
+        while len(pv) < depth:
+            entry = self.table.probe(position.key)
+            if entry is None or entry.move is None or position.key in seen:
+                break
+            if entry.move not in position.legal_moves():
+                break
+            seen.add(position.key)
+            pv.append(entry.move)
+            position.make_move(entry.move)
+        for _ in pv:
+            position.unmake_move()
+        return pv
+
+
+def is_capture(position: Position, move: Move) -> bool:
+    if position.squares[move.to_row * 8 + move.to_column]:
+        return True
+    return (move.to_row, move.to_column) == position.en_passant and position.squares[move.from_row * 8 + move.from_column] & TYPE_MASK == PAWN
+
+
+def score_to_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def format_info(info: SearchInfo, hashfull: int | None = None) -> str:
+    if abs(info.score) >= MATE_BOUND:
+        moves_to_mate = (MATE_SCORE - abs(info.score) + 1) // 2
+        score = f"mate {moves_to_mate if info.score > 0 else -moves_to_mate}"
+    else:
+        score = f"cp {info.score}"
+    table = f" hashfull {hashfull}" if hashfull is not None else ""
+    return f"depth {info.depth} score {score} nodes {info.nodes} nps {info.nps} time {int(info.seconds * 1000)}{table} pv {' '.join(move.uci() for move in info.pv)}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search a position with iterative deepening alpha-beta.")
+    parser.add_argument("--fen", default=None, help="position to search (defaults to the start position)")
+    parser.add_argument("--depth", type=int, default=MAX_PLY, help="maximum search depth in plies")
+    parser.add_argument("--time", type=float, default=None, help="time budget in seconds")
+    parser.add_argument("--nodes", type=int, default=None, help="node budget")
+    parser.add_argument("--book", default=None, help="opening book to play from before searching")
+    parser.add_argument("--tablebases", default=None, help="directory of endgame tablebases to probe during search")
+    parser.add_argument("--profile", metavar="PATH", default=None, help=f"write PATH.prof and PATH.json profiles (also ${profiler.PROFILE_VARIABLE})")
+    args = parser.parse_args()
+    profiler.run(lambda: execute(args), profiler.profile_path(args.profile))
+
+
+def execute(args: argparse.Namespace) -> None:
+    position = Position()
+    if args.fen is not None:
+        position.load_fen(args.fen)
+    if args.time is None and args.nodes is None and args.depth == MAX_PLY:
+        args.time = 5.0
+
+    book = OpeningBook(args.book) if args.book is not None else None
+    engine = Engine(book=book, tablebase=Tablebase(args.tablebases) if args.tablebases is not None else None)
+    result = engine.search(position, args.depth, args.time, args.nodes, lambda info: print("info " + format_info(info, engine.table.hashfull()), flush=True))
+    print(f"bestmove {result.move.uci() if result.move is not None else '0000'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+from piece import PIECES, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, BLACK, TYPE_MASK
+from position import Position
+from tables import KNIGHT_TARGETS, ROOK_RAYS, BISHOP_RAYS, QUEEN_RAYS
+
+PIECE_VALUES = {"K": 0, "Q": 900, "R": 500, "B": 330, "N": 320, "P": 100}
+
+PIECE_SQUARE_TABLES = {
+    "P": [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    "N": [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    "B": [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    "R": [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    "Q": [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    "K": [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+MOBILITY_WEIGHTS = {KNIGHT: 4, BISHOP: 4, ROOK: 2, QUEEN: 1}
+DOUBLED_PAWN = 12
+ISOLATED_PAWN = 10
+PASSED_PAWN = [0, 70, 50, 30, 20, 10, 5, 0]
+
+
+def build_value_table() -> list[list[int]]:
+    table = [[0] * 64 for _ in range(16)]
+    for code, piece in enumerate(PIECES):
+        if piece is None:
+            continue
+        for square in range(64):
+            if code & BLACK:
+                table[code][square] = -(PIECE_VALUES[piece.symbol] + PIECE_SQUARE_TABLES[piece.symbol][square ^ 56])
+            else:
+                table[code][square] = PIECE_VALUES[piece.symbol] + PIECE_SQUARE_TABLES[piece.symbol][square]
+    return table
+
+
+VALUE_TABLE = build_value_table()
+
+
+def evaluate(position: Position) -> int:
+    squares = position.squares
+    score = material(squares) + mobility(squares) + pawn_structure(squares)
+    return score if position.current_player == "W" else -score
+
+
+def material(squares: bytearray) -> int:
+    score = 0
+    for square, code in enumerate(squares):
+        if code:
+            score += VALUE_TABLE[code][square]
+    return score
+
+
+def mobility(squares: bytearray) -> int:
+    score = 0
+    for square, code in enumerate(squares):
+        kind = code & TYPE_MASK
+        if kind not in MOBILITY_WEIGHTS:
+            continue
+        count = 0
+        if kind == KNIGHT:
+            for target in KNIGHT_TARGETS[square]:
+                if not squares[target] or squares[target] & BLACK != code & BLACK:
+                    count += 1
+        else:
+            for ray in QUEEN_RAYS[square] if kind == QUEEN else ROOK_RAYS[square] if kind == ROOK else BISHOP_RAYS[square]:
+                for target in ray:
+                    count += 1
+                    if squares[target]:
+                        break
+        score += -count * MOBILITY_WEIGHTS[kind] if code & BLACK else count * MOBILITY_WEIGHTS[kind]
+    return score
+
+
+def pawn_structure(squares: bytearray) -> int:
+    files = {0: [0] * 8, BLACK: [0] * 8}
+    pawns = []
+    for square, code in enumerate(squares):
+        if code & TYPE_MASK == PAWN:
+            files[code & BLACK][square & 7] += 1
+            pawns.append((square, code & BLACK))
+
+    score = 0
+    for color, sign in ((0, 1), (BLACK, -1)):
+        for file in range(8):
+            if files[color][file] > 1:
+                score -= sign * DOUBLED_PAWN * (files[color][file] - 1)
+
+    for square, color in pawns:
+        row, file = square >> 3, square & 7
+        sign = -1 if color else 1
+        own = files[color]
+        if (file == 0 or own[file - 1] == 0) and (file == 7 or own[file + 1] == 0):
+            score -= sign * ISOLATED_PAWN
+        enemy = PAWN | (0 if color else BLACK)
+        ahead = range(row - 1, -1, -1) if color == 0 else range(row + 1, 8)
+        if not any(squares[other_row * 8 + other_file] == enemy for other_row in ahead for other_file in (file - 1, file, file + 1) if 0 <= other_file <= 7):
+            score += sign * PASSED_PAWN[row if color == 0 else 7 - row]
+    return score
@@ -0,0 +1,34 @@
+from typing import NamedTuple
+from piece import Piece
+
+FILES = "abcdefgh"
+
+
+class Move(NamedTuple):
+    from_row: int
+    from_column: int
+    to_row: int
+    to_column: int
+    promotion: type[Piece] | None = None
+
+    def __str__(self) -> str:
+        return self.uci()
+
+    def uci(self) -> str:
+        text = square_name(self.from_row, self.from_column) + square_name(self.to_row, self.to_column)
+        if self.promotion is not None:
+            text += self.promotion.symbol.lower()
+        return text
+
+
+class Undo(NamedTuple):
+    move: Move
+    piece: int
+    captured: int
+    castling_rights: str
+    en_passant: tuple[int, int] | None
+    halfmove_clock: int
+
+
+def square_name(row: int, column: int) -> str:
+    return FILES[column] + str(8 - row)
@@ -0,0 +1,117 @@
+import argparse
+import json
+import multiprocessing.synchronize
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, as_completed
+from typing import Iterator, NamedTuple
+from book import OpeningBook
+from engine import Engine, MATE_BOUND, MATE_SCORE, SearchInfo
+from move import Move
+from position import Position
+
+worker_engine: Engine | None = None
+
+
+class BatchResult(NamedTuple):
+    index: int
+    fen: str
+    info: SearchInfo
+
+
+class RootResult(NamedTuple):
+    move: Move
+    score: int
+    depth: int
+    nodes: int
+    pv: list[Move]
+
+
+def init_worker(table_size: int, book_path: str | None = None, stop_event: multiprocessing.synchronize.Event | None = None) -> None:
+    global worker_engine
+    worker_engine = Engine(table_size, OpeningBook(book_path) if book_path is not None else None)
+    worker_engine.stop_event = stop_event
+
+
+def analyse_position(index: int, fen: str, depth: int, time_limit: float | None, node_limit: int | None) -> BatchResult:
+    position = Position()
+    position.load_fen(fen)
+    worker_engine.table.clear()
+    return BatchResult(index, fen, worker_engine.search(position, depth, time_limit, node_limit))
+
+
+def parent_score(score: int) -> int:
+    score = -score
+    if score >= MATE_BOUND:
+        return score - 1
+    if score <= -MATE_BOUND:
+        return score + 1
+    return score
+
+
+def search_root_move(fen: str, text: str, depth: int, time_limit: float | None, node_limit: int | None) -> RootResult:
+    position = Position()
+    position.load_fen(fen)
+    move = position.parse_move(text)
+    position.make_move(move)
+
+    if not position.has_legal_move():
+        score = parent_score(-MATE_SCORE) if position.is_checked() else 0
+        return RootResult(move, score, depth, 1, [move])
+    if position.is_threefold_repetition() or position.is_fifty_move_rule():
+        return RootResult(move, 0, depth, 1, [move])
+
+    info = worker_engine.search(position, max(depth - 1, 1), time_limit, node_limit, single_move_exit=False)
+    return RootResult(move, parent_score(info.score), info.depth + 1, info.nodes, [move] + info.pv)
+
+
+def analyse_batch(fens: list[str], depth: int = 64, time_limit: float | None = None, node_limit: int | None = None, workers: int | None = None, table_size: int = 1 << 16) -> Iterator[BatchResult]:
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_worker, initargs=(table_size,)) as executor:
+        futures = [executor.submit(analyse_position, index, fen, depth, time_limit, node_limit) for index, fen in enumerate(fens)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def parallel_search(fen: str, depth: int, time_limit: float | None = None, node_limit: int | None = None, workers: int | None = None, table_size: int = 1 << 16) -> Iterator[RootResult]:
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_worker, initargs=(table_size,)) as executor:
+        for future in as_completed(submit_root_moves(executor, fen, depth, time_limit, node_limit)):
+            yield future.result()
+
+
+def submit_root_moves(executor: Executor, fen: str, depth: int, time_limit: float | None = None, node_limit: int | None = None) -> list[Future]:
+    position = Position()
+    position.load_fen(fen)
+    return [executor.submit(search_root_move, fen, move.uci(), depth, time_limit, node_limit) for move in position.legal_moves()]
+
+
+def best_root_result(results: list[RootResult]) -> RootResult | None:
+    return max(results, key=lambda result: result.score, default=None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyse positions on several processes.")
+    parser.add_argument("fens", nargs="?", default=None, help="file with one FEN per line (omit to split the root of --fen)")
+    parser.add_argument("--fen", default="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", help="position for a root-split search")
+    parser.add_argument("--depth", type=int, default=4, help="search depth in plies")
+    parser.add_argument("--time", type=float, default=None, help="time budget per search in seconds")
+    parser.add_argument("--nodes", type=int, default=None, help="node budget per search")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    if args.fens is not None:
+        with open(args.fens) as file:
+            fens = [line.strip() for line in file if line.strip()]
+        for result in analyse_batch(fens, args.depth, args.time, args.nodes, args.workers):
+            info = result.info
+            print(json.dumps({"index": result.index, "fen": result.fen, "depth": info.depth, "score": info.score, "nodes": info.nodes, "nps": info.nps, "pv": [move.uci() for move in info.pv]}), flush=True)
+        return
+
+    results = []
+    for result in parallel_search(args.fen, args.depth, args.time, args.nodes, args.workers):
+        results.append(result)
+        print(json.dumps({"move": result.move.uci(), "score": result.score, "depth": result.depth, "nodes": result.nodes, "pv": [move.uci() for move in result.pv]}), flush=True)
+    best = best_root_result(results)
+    print(f"bestmove {best.move.uci() if best is not None else '0000'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import json
+import time
+import profiler
+from bitboard import BitboardPosition
+from position import Position
+
+BACKENDS: dict[str, type[Position]] = {"list": Position, "bitboard": BitboardPosition}
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+POSITIONS = [
+    ("startpos", START_FEN, [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("promotions", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("discovered", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+]
+
+
+def perft(position: Position, depth: int) -> int:
+    moves = position.legal_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+    return nodes
+
+
+def divide(position: Position, depth: int) -> dict[str, int]:
+    counts = {}
+    for move in position.legal_moves():
+        position.make_move(move)
+        counts[move.uci()] = perft(position, depth - 1)
+        position.unmake_move()
+    return counts
+
+
+def run(fen: str, depth: int, split: bool = False, backend: str = "list") -> dict:
+    position = BACKENDS[backend]()
+    position.load_fen(fen)
+
+    start = time.perf_counter()
+    if split:
+        counts = divide(position, depth)
+        nodes = sum(counts.values())
+    else:
+        counts = None
+        nodes = perft(position, depth)
+    elapsed = time.perf_counter() - start
+
+    result = {"fen": fen, "backend": backend, "depth": depth, "nodes": nodes, "seconds": round(elapsed, 6), "nps": int(nodes / elapsed) if elapsed > 0 else 0}
+    if counts is not None:
+        result["divide"] = counts
+    return result
+
+
+def run_suite(depth: int, backend: str = "list") -> list[dict]:
+    results = []
+    for name, fen, expected in POSITIONS:
+        for current_depth in range(1, min(depth, len(expected)) + 1):
+            result = run(fen, current_depth, backend=backend)
+            result["name"] = name
+            result["expected"] = expected[current_depth - 1]
+            result["passed"] = result["nodes"] == result["expected"]
+            results.append(result)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Count leaf nodes of the legal move tree.")
+    parser.add_argument("--fen", default=START_FEN, help="position to search from")
+    parser.add_argument("--depth", type=int, default=3, help="search depth in plies")
+    parser.add_argument("--divide", action="store_true", help="report node counts per root move")
+    parser.add_argument("--suite", action="store_true", help="run the bundled positions up to --depth")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="list", help="position representation to use")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--profile", metavar="PATH", default=None, help=f"write PATH.prof and PATH.json profiles (also ${profiler.PROFILE_VARIABLE})")
+    args = parser.parse_args()
+    return profiler.run(lambda: execute(args), profiler.profile_path(args.profile))
+
+
+def execute(args: argparse.Namespace) -> int:
+    if args.suite:
+        results = run_suite(args.depth, args.backend)
+        passed = all(result["passed"] for result in results)
+        if args.json:
+            total_nodes = sum(result["nodes"] for result in results)
+            total_seconds = sum(result["seconds"] for result in results)
+            print(json.dumps({"passed": passed, "nodes": total_nodes, "seconds": round(total_seconds, 6), "nps": int(total_nodes / total_seconds) if total_seconds > 0 else 0, "results": results}, indent=2))
+        else:
+            for result in results:
+                status = "ok" if result["passed"] else f"FAIL (expected {result['expected']})"
+                print(f"{result['name']:<12} depth {result['depth']}: {result['nodes']:>10} nodes {result['nps']:>9} nps {status}")
+        return 0 if passed else 1
+
+    result = run(args.fen, args.depth, args.divide, args.backend)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for move, count in result.get("divide", {}).items():
+            print(f"{move}: {count}")
+        print(f"nodes {result['nodes']} time {result['seconds']:.3f}s nps {result['nps']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+import argparse
+import re
+import time
+from typing import Iterable, Iterator, NamedTuple, TextIO
+from move import Move
+from position import Position
+
+TAG_PATTERN = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+TOKEN_PATTERN = re.compile(r"[{}();]|[^\s{}();]+")
+MOVE_NUMBER_PATTERN = re.compile(r"^\d+\.+")
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+
+class Game(NamedTuple):
+    headers: dict[str, str]
+    moves: list[Move]
+    result: str
+    fen: str
+    error: str | None
+
+
+class GameReader:
+    def __init__(self):
+        self.headers: dict[str, str] = {}
+        self.moves: list[Move] = []
+        self.position = Position()
+        self.error: str | None = None
+        self.started = False
+        self.in_comment = False
+        self.variation_depth = 0
+
+    def reset(self) -> None:
+        self.headers = {}
+        self.moves = []
+        self.error = None
+        self.started = False
+        self.in_comment = False
+        self.variation_depth = 0
+
+    def begin(self) -> None:
+        self.started = True
+        self.position = Position()
+        if "FEN" in self.headers:
+            try:
+                self.position.load_fen(self.headers["FEN"])
+            except ValueError as error:
+                self.error = str(error)
+
+    def finish(self, result: str) -> Game:
+        if not self.started:
+            self.begin()
+        game = Game(self.headers, self.moves, result, self.position.fen(), self.error)
+        self.reset()
+        return game
+
+    def add_token(self, token: str) -> Game | None:
+        if not self.started:
+            self.begin()
+        if token in RESULTS:
+            return self.finish(token)
+        if token.startswith("$") or self.error is not None:
+            return None
+
+        token = MOVE_NUMBER_PATTERN.sub("", token)
+        if not token:
+            return None
+        try:
+            move = self.position.parse_san(token)
+        except ValueError as error:
+            self.error = f"ply {len(self.moves) + 1}: {error}"
+            return None
+        self.position.make_move(move)
+        self.moves.append(move)
+        return None
+
+    def add_line(self, line: str) -> Iterator[Game]:
+        if not self.in_comment and self.variation_depth == 0:
+            stripped = line.strip()
+            if stripped.startswith("%"):
+                return
+            match = TAG_PATTERN.match(stripped)
+            if match is not None:
+                if self.started:
+                    yield self.finish(self.headers.get("Result", "*"))
+                self.headers[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+                return
+
+        for token in TOKEN_PATTERN.findall(line):
+            if self.in_comment:
+                if token == "}":
+                    self.in_comment = False
+                continue
+            if token == "{":
+                self.in_comment = True
+            elif token == ";":
+                break
+            elif token == "(":
+                self.variation_depth += 1
+            elif token == ")":
+                self.variation_depth = max(self.variation_depth - 1, 0)
+            elif self.variation_depth == 0:
+                game = self.add_token(token)
+                if game is not None:
+                    yield game
+
+
+def read_games(lines: Iterable[str]) -> Iterator[Game]:
+    reader = GameReader()
+    for line in lines:
+        yield from reader.add_line(line)
+    if reader.started or reader.headers:
+        yield reader.finish(reader.headers.get("Result", "*"))
+
+
+def write_game(headers: dict[str, str], moves: list[Move], result: str = "*", fen: str | None = None) -> str:
+    position = Position()
+    if fen is not None:
+        position.load_fen(fen)
+        headers = {**headers, "SetUp": "1", "FEN": fen}
+    headers = {**headers, "Result": result}
+
+    lines = [f'[{name} "{value}"]' for name, value in headers.items()]
+    lines.append("")
+
+    tokens = []
+    for move in moves:
+        if position.current_player == "W":
+            tokens.append(f"{position.fullmove_number}.")
+        elif len(tokens) == 0:
+            tokens.append(f"{position.fullmove_number}...")
+        tokens.append(position.san(move))
+        position.make_move(move)
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + len(token) + 1 > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def validate(file: TextIO) -> dict[str, int | float]:
+    start = time.perf_counter()
+    games = plies = errors = 0
+    for game in read_games(file):
+        games += 1
+        plies += len(game.moves)
+        if game.error is not None:
+            errors += 1
+            event = game.headers.get("Event", "?")
+            print(f"game {games} ({event}): {game.error}")
+    elapsed = time.perf_counter() - start
+    return {"games": games, "plies": plies, "errors": errors, "seconds": round(elapsed, 3), "plies_per_second": int(plies / elapsed) if elapsed > 0 else 0}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay every game of a PGN file through the rules engine.")
+    parser.add_argument("path", help="PGN file to validate")
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8", errors="replace") as file:
+        summary = validate(file)
+    print(" ".join(f"{name} {value}" for name, value in summary.items()))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,230 +1,177 @@
 from __future__ import annotations
 from abc import abstractmethod, ABC
 import typing
+from tables import COORDINATES, KNIGHT_TARGETS, KING_TARGETS, ROOK_RAYS, BISHOP_RAYS, QUEEN_RAYS, PAWN_PUSHES, PAWN_CAPTURES
 
 if typing.TYPE_CHECKING:
-    from board import Board
+    from position import Position
+
+EMPTY = 0
+PAWN = 1
+KNIGHT = 2
+BISHOP = 3
+ROOK = 4
+QUEEN = 5
+KING = 6
+BLACK = 8
+TYPE_MASK = 7
+
+
+def color_bit(color: str) -> int:
+    return BLACK if color == "B" else 0
 
 
 class Piece:
+    __slots__ = ("color", "code")
+    symbol = ""
+    kind = EMPTY
+
     def __init__(self, color: str):
         self.color = color
+        self.code = self.kind | color_bit(color)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Piece) and other.code == self.code
+
+    def __hash__(self) -> int:
+        return self.code
 
     @abstractmethod
     def __repr__(self) -> str:
         pass
 
     @abstractmethod
-    def moves(self, board: Board, row: int, column: int, check_check: bool) -> list[tuple[int, int]]:
+    def targets(self, board: Position, square: int) -> list[int]:
         pass
 
-    def filter_moves(self, board: Board, moves: list[tuple[int, int]], old_row: int, old_column: int) -> list[tuple[int, int]]:
-        filtered_moves = []
-
-        for new_row, new_column in moves:
-            temp_piece = board.get_piece(new_row, new_column)
-            board.move_piece(old_row, old_column, new_row, new_column)
-
-            if not board.is_checked():
-                filtered_moves.append((new_row, new_column))
-
-            board.set_piece(self, old_row, old_column)
-            board.set_piece(temp_piece, new_row, new_column)
+    def moves(self, board: Position, row: int, column: int, check_check: bool) -> list[tuple[int, int]]:
+        moves = [COORDINATES[target] for target in self.targets(board, row * 8 + column)]
+        if check_check:
+            return self.filter_moves(board, moves, row, column)
+        return moves
 
-        return filtered_moves
+    def filter_moves(self, board: Position, moves: list[tuple[int, int]], old_row: int, old_column: int) -> list[tuple[int, int]]:
+        legal_moves = board.legal_moves_from(old_row, old_column)
+        return [move for move in moves if move in legal_moves]
+
+    def step(self, board: Position, targets: list[int]) -> list[int]:
+        squares = board.squares
+        own = self.code & BLACK
+        return [target for target in targets if not squares[target] or squares[target] & BLACK != own]
+
+    def slide(self, board: Position, rays: list[list[int]]) -> list[int]:
+        squares = board.squares
+        own = self.code & BLACK
+        targets = []
+        for ray in rays:
+            for target in ray:
+                code = squares[target]
+                if not code:
+                    targets.append(target)
+                else:
+                    if code & BLACK != own:
+                        targets.append(target)
+                    break
+        return targets
 
 
 class King(Piece, ABC):
-    def __init__(self, color):
-        super().__init__(color)
-        self.has_moved = False
-        
+    __slots__ = ()
+    symbol = "K"
+    kind = KING
+
     def __repr__(self):
         return "W_King" if self.color == "W" else "B_King"
 
-    def moved(self):
-        self.has_moved = True
-
-    def moves(self, board: Board, row: int, column: int, check_check: bool) -> list[tuple[int, int]]:
-        moves = []
-        directions = [(-1, -1), (0, -1), (-1, 1), (-1, 0), (0, 1), (1, -1), (1, 0), (1, 1)]
-
-        for dir_row, dir_column in directions:
-            new_row, new_column = row + dir_row, column + dir_column
-            if board.is_valid_tile(new_row, new_column):
-                current_piece = board.get_piece(new_row, new_column)
-                if current_piece is None or current_piece.color != self.color:
-                    temp_piece = board.get_piece(new_row, new_column)
-                    board.move_piece(row, column, new_row, new_column)
-
-                    if not board.is_checked():
-                        moves.append((new_row, new_column))
-
-                    board.set_piece(self, row, column)
-                    board.set_piece(temp_piece, new_row, new_column)
+    def targets(self, board: Position, square: int) -> list[int]:
+        return self.step(board, KING_TARGETS[square])
 
-        if not board.is_checked() and not self.has_moved:
-            if board.can_castle("king"):
-                moves.append((row, 6))
-            if board.can_castle("queen"):
-                moves.append((row, 2))
-        
-        return self.filter_moves(board, moves, row, column)
+    def moves(self, board: Position, row: int, column: int, check_check: bool) -> list[tuple[int, int]]:
+        if check_check:
+            return board.legal_moves_from(row, column)
+        return super().moves(board, row, column, False)
 
 
 class Queen(Piece, ABC):
-    def __init__(self, color):
-        super().__init__(color)
+    __slots__ = ()
+    symbol = "Q"
+    kind = QUEEN
 
     def __repr__(self):
         return "W_Queen" if self.color == "W" else "B_Queen"
 
-    def moves(self, board: Board, row: int, column: int, check_check: bool) -> list[tuple[int, int]]:
-        moves = []
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
-
-        for dir_row, dir_column in directions:
-            current_row, current_column = row + dir_row, column + dir_column
-            while board.is_valid_tile(current_row, current_column):
-                current_piece = board.get_piece(current_row, current_column)
-                if current_piece is None:
-                    moves.append((current_row, current_column))
-                elif current_piece.color != self.color:
-                    moves.append((current_row, current_column))
-                    break
-                else:
-                    break
-                current_row += dir_row
-                current_column += dir_column
-
-        if check_check:
-            return self.filter_moves(board, moves, row, column)
-        return moves
+    def targets(self, board: Position, square: int) -> list[int]:
+        return self.slide(board, QUEEN_RAYS[square])
 
 
 class Rook(Piece, ABC):
-    def __init__(self, color):
-        super().__init__(color)
-        self.has_moved = False
+    __slots__ = ()
+    symbol = "R"
+    kind = ROOK
 
     def __repr__(self):
         return "W_Rook" if self.color == "W" else "B_Rook"
 
-    def moved(self):
-        self.has_moved = True        
-
-    def moves(self, board: Board, row: int, column: int, check_check: bool) -> list[tuple[int, int]]:
-        moves = []
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-
-        for dir_row, dir_column in directions:
-            current_row, current_column = row + dir_row, column + dir_column
-            while board.is_valid_tile(current_row, current_column):
-                current_piece = board.get_piece(current_row, current_column)
-                if current_piece is None:
-                    moves.append((current_row, current_column))
-                elif current_piece.color != self.color:
-                    moves.append((current_row, current_column))
-                    break
-                else:
-                    break
-                current_row += dir_row
-                current_column += dir_column
-
-        if check_check:
-            return self.filter_moves(board, moves, row, column)
-        return moves
+    def targets(self, board: Position, square: int) -> list[int]:
+        return self.slide(board, ROOK_RAYS[square])
 
 
 class Bishop(Piece, ABC):
-    def __init__(self, color):
-        super().__init__(color)
+    __slots__ = ()
+    symbol = "B"
+    kind = BISHOP
 
     def __repr__(self):
         return "W_Bishop" if self.color == "W" else "B_Bishop"
 
-    def moves(self, board: Board, row: int, column: int, check_check: bool) -> list[tuple[int, int]]:
-        moves = []
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-
-        for dir_row, dir_column in directions:
-            current_row, current_column = row + dir_row, column + dir_column
-            while board.is_valid_tile(current_row, current_column):
-                current_piece = board.get_piece(current_row, current_column)
-                if current_piece is None:
-                    moves.append((current_row, current_column))
-                elif current_piece.color != self.color:
-                    moves.append((current_row, current_column))
-                    break
-                else:
-                    break
-                current_row += dir_row
-                current_column += dir_column
-
-        if check_check:
-            return self.filter_moves(board, moves, row, column)
-        return moves
+    def targets(self, board: Position, square: int) -> list[int]:
+        return self.slide(board, BISHOP_RAYS[square])
 
 
 class Knight(Piece, ABC):
-    def __init__(self, color):
-        super().__init__(color)
+    __slots__ = ()
+    symbol = "N"
+    kind = KNIGHT
 
     def __repr__(self):
         return "W_Knight" if self.color == "W" else "B_Knight"
 
-    def moves(self, board: Board, row: int, column: int, check_check: bool) -> list[tuple[int, int]]:
-        moves = []
-        directions = [(-1, -2), (1, -2), (-1, 2), (1, 2), (-2, -1), (2, -1), (-2, 1), (2, 1)]
-
-        for dir_row, dir_column in directions:
-            if board.is_valid_tile(row + dir_row, column + dir_column):
-                current_piece = board.get_piece(row + dir_row, column + dir_column)
-                if current_piece is None:
-                    moves.append((row + dir_row, column + dir_column))
-                elif self.color != current_piece.color:
-                    moves.append((row + dir_row, column + dir_column))
-
-        if check_check:
-            return self.filter_moves(board, moves, row, column)
-        return moves
+    def targets(self, board: Position, square: int) -> list[int]:
+        return self.step(board, KNIGHT_TARGETS[square])
 
 
 class Pawn(Piece, ABC):
-    def __init__(self, color):
-        super().__init__(color)
-        self.double_moved = False
+    __slots__ = ()
+    symbol = "P"
+    kind = PAWN
 
     def __repr__(self):
         return "W_Pawn" if self.color == "W" else "B_Pawn"
-    
-    def update(self, foo: bool):
-        self.double_moved = foo
-
-    def moves(self, board: Board, row: int, column: int, check_check: bool) -> list[tuple[int, int]]:
-        moves = []
-        forward = -1 if self.color == "W" else 1
-
-        if board.get_piece(row + forward, column) is None:
-            moves.append((row + forward, column))
-            if (row == 1 and self.color == "B") or (row == 6 and self.color == "W"):
-                if not board.get_piece(row + 2 * forward, column):
-                    moves.append((row + 2 * forward, column))
-   
-        if column > 0:
-            left_piece = board.get_piece(row + forward, column - 1) 
-            if left_piece and left_piece.color != self.color:
-                moves.append((row + forward, column - 1))
-            if board.can_en_passant(row, column, "left"):
-                moves.append((row + forward, column - 1))
-        
-        if column < 7:
-            right_piece = board.get_piece(row + forward, column + 1) 
-            if right_piece and right_piece.color != self.color:
-                moves.append((row + forward, column + 1))
-            if board.can_en_passant(row, column, "right"):
-                moves.append((row + forward, column + 1))
-                
-        if check_check:
-            return self.filter_moves(board, moves, row, column)
-        return moves
+
+    def targets(self, board: Position, square: int) -> list[int]:
+        squares = board.squares
+        own = self.code & BLACK
+        targets = []
+
+        for target in PAWN_PUSHES[self.color][square]:
+            if squares[target]:
+                break
+            targets.append(target)
+
+        for target in PAWN_CAPTURES[self.color][square]:
+            code = squares[target]
+            if code:
+                if code & BLACK != own:
+                    targets.append(target)
+            elif COORDINATES[target] == board.en_passant and self.color == board.current_player:
+                targets.append(target)
+
+        return targets
+
+
+PIECE_TYPES: list[type[Piece]] = [King, Queen, Rook, Bishop, Knight, Pawn]
+PIECES: list[Piece | None] = [None] * 16
+for piece_type in PIECE_TYPES:
+    for piece_color in "WB":
+        flyweight = piece_type(piece_color)
+        PIECES[flyweight.code] = flyweight
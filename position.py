@@ -0,0 +1,688 @@
+from piece import Piece, King, Queen, Rook, Bishop, Knight, Pawn, PIECES, EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK, TYPE_MASK
+import re
+from typing import Iterator, NamedTuple
+from move import FILES, Move, Undo, square_name
+from tables import COORDINATES, KING_DIRECTIONS, KNIGHT_TARGETS, KING_TARGETS, RAYS, ROOK_RAYS, BISHOP_RAYS, QUEEN_RAYS, PAWN_CAPTURES
+from zobrist import PIECE_KEYS, SIDE_KEY, castling_key, en_passant_key
+
+COLORS = ("W", "B")
+PROMOTIONS = [Queen, Rook, Bishop, Knight]
+PIECE_SYMBOLS: dict[str, type[Piece]] = {piece.symbol: piece for piece in (King, Queen, Rook, Bishop, Knight, Pawn)}
+SLIDERS = {direction: (ROOK, QUEEN) if direction[0] == 0 or direction[1] == 0 else (BISHOP, QUEEN) for direction in KING_DIRECTIONS}
+OPPOSITES = {direction: (-direction[0], -direction[1]) for direction in KING_DIRECTIONS}
+SAN_PATTERN = re.compile(r"^([KQRBN])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([QRBN]))?$")
+EN_PASSANT_PATTERN = re.compile(r"^(-|[a-h][36])$")
+IN_PROGRESS = "in progress"
+CHECK = "check"
+CHECKMATE = "checkmate"
+STALEMATE = "stalemate"
+DRAW = "draw"
+START_SQUARES = bytes([
+    ROOK | BLACK, KNIGHT | BLACK, BISHOP | BLACK, QUEEN | BLACK, KING | BLACK, BISHOP | BLACK, KNIGHT | BLACK, ROOK | BLACK,
+    *[PAWN | BLACK] * 8,
+    *[EMPTY] * 32,
+    *[PAWN] * 8,
+    ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK,
+])
+
+
+class GameStatus(NamedTuple):
+    state: str
+    moves: dict[tuple[int, int], list[Move]]
+
+    @property
+    def is_over(self) -> bool:
+        return self.state in (CHECKMATE, STALEMATE, DRAW)
+
+    def targets(self, row: int, column: int) -> list[tuple[int, int]]:
+        targets = []
+        for move in self.moves.get((row, column), []):
+            if (move.to_row, move.to_column) not in targets:
+                targets.append((move.to_row, move.to_column))
+        return targets
+
+
+class Position:
+    def __init__(self, current_player: str = "W"):
+        self.current_player = current_player
+        self.squares = bytearray(64)
+        self.attack_map: dict[str, bytearray] = {"W": bytearray(64), "B": bytearray(64)}
+        self.king_squares: dict[str, int] = {"W": -1, "B": -1}
+        self.castling_rights = "KQkq"
+        self.en_passant: tuple[int, int] | None = None
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.history: list[Undo] = []
+        self.key = 0
+        self.key_history: list[int] = []
+        self.game_status: GameStatus | None = None
+
+        self.init_board()
+        self.key = self.compute_key()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.fen()!r})"
+
+    @property
+    def board(self) -> list[list[Piece | None]]:
+        return [[PIECES[self.squares[row * 8 + column]] for column in range(8)] for row in range(8)]
+
+    def copy(self) -> "Position":
+        position = object.__new__(type(self))
+        position.__dict__.update(self.__dict__)
+        position.squares = self.squares[:]
+        position.attack_map = {"W": self.attack_map["W"][:], "B": self.attack_map["B"][:]}
+        position.king_squares = dict(self.king_squares)
+        position.history = self.history[:]
+        position.key_history = self.key_history[:]
+        return position
+
+    def init_board(self) -> None:
+        for square, code in enumerate(START_SQUARES):
+            self.set_code(code, square)
+
+    def load_fen(self, fen: str) -> None:
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"Invalid FEN: {fen}")
+
+        for square in range(64):
+            self.set_code(EMPTY, square)
+
+        ranks = fields[0].split("/")
+        if len(ranks) != 8:
+            raise ValueError(f"Invalid FEN: {fen}")
+        for row, rank in enumerate(ranks):
+            column = 0
+            for char in rank:
+                if char.isdigit():
+                    column += int(char)
+                elif char.upper() in PIECE_SYMBOLS and column < 8:
+                    self.set_piece(PIECE_SYMBOLS[char.upper()]("W" if char.isupper() else "B"), row, column)
+                    column += 1
+                else:
+                    raise ValueError(f"Invalid FEN: {fen}")
+            if column != 8:
+                raise ValueError(f"Invalid FEN: {fen}")
+
+        if fields[1] not in ("w", "b"):
+            raise ValueError(f"Invalid FEN: {fen}")
+        self.current_player = fields[1].upper()
+        self.castling_rights = "".join(right for right in "KQkq" if right in fields[2])
+        if not EN_PASSANT_PATTERN.match(fields[3]):
+            raise ValueError(f"Invalid FEN: {fen}")
+        self.en_passant = None if fields[3] == "-" else (8 - int(fields[3][1]), FILES.index(fields[3][0]))
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        self.history = []
+        self.key = self.compute_key()
+        self.key_history = []
+        self.game_status = None
+
+    def fen(self) -> str:
+        ranks = []
+        for row in range(8):
+            rank = ""
+            empty = 0
+            for column in range(8):
+                piece = PIECES[self.squares[row * 8 + column]]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty > 0:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece.symbol if piece.color == "W" else piece.symbol.lower()
+            if empty > 0:
+                rank += str(empty)
+            ranks.append(rank)
+
+        en_passant = "-" if self.en_passant is None else square_name(*self.en_passant)
+        return f"{'/'.join(ranks)} {self.current_player.lower()} {self.castling_rights or '-'} {en_passant} {self.halfmove_clock} {self.fullmove_number}"
+
+    def compute_key(self) -> int:
+        key = 0
+        for square, code in enumerate(self.squares):
+            if code:
+                key ^= PIECE_KEYS[code][square]
+        if self.current_player == "B":
+            key ^= SIDE_KEY
+        return key ^ castling_key(self.castling_rights) ^ self.en_passant_hash()
+
+    def get_piece(self, row: int, column: int) -> Piece | None:
+        return PIECES[self.squares[row * 8 + column]]
+
+    def set_piece(self, piece: Piece | None, row: int, column: int) -> None:
+        self.set_code(piece.code if piece is not None else EMPTY, row * 8 + column)
+
+    def set_code(self, code: int, square: int) -> None:
+        self.game_status = None
+        old_code = self.squares[square]
+        if old_code:
+            self.key ^= PIECE_KEYS[old_code][square]
+            self.update_attacks(old_code, square, -1)
+            if old_code & TYPE_MASK == KING and self.king_squares[COLORS[old_code >> 3]] == square:
+                self.king_squares[COLORS[old_code >> 3]] = -1
+        if (not old_code) != (not code):
+            self.update_rays(square, 1 if not code else -1)
+
+        self.squares[square] = code
+
+        if code:
+            self.key ^= PIECE_KEYS[code][square]
+            self.update_attacks(code, square, 1)
+            if code & TYPE_MASK == KING:
+                self.king_squares[COLORS[code >> 3]] = square
+
+    def move_piece(self, old_row: int, old_column: int, new_row: int, new_column: int) -> None:
+        self.move_code(old_row * 8 + old_column, new_row * 8 + new_column)
+
+    def move_code(self, old_square: int, new_square: int) -> None:
+        code = self.squares[old_square]
+        self.set_code(EMPTY, old_square)
+        self.set_code(code, new_square)
+
+    def make_move(self, move: Move) -> None:
+        from_row, from_column, to_row, to_column, promotion = move
+        from_square, to_square = from_row * 8 + from_column, to_row * 8 + to_column
+        code = self.squares[from_square]
+        kind = code & TYPE_MASK
+        captured = self.squares[to_square]
+        en_passant = kind == PAWN and (to_row, to_column) == self.en_passant
+        if en_passant:
+            captured = self.squares[from_row * 8 + to_column]
+        self.game_status = None
+        self.history.append(Undo(move, code, captured, self.castling_rights, self.en_passant, self.halfmove_clock))
+        self.key_history.append(self.key)
+        self.set_en_passant(None)
+
+        if en_passant:
+            self.set_code(EMPTY, from_row * 8 + to_column)
+        if kind == KING and abs(to_column - from_column) == 2:
+            if to_column == 6:
+                self.move_code(from_square + 3, from_square + 1)
+            else:
+                self.move_code(from_square - 4, from_square - 1)
+
+        self.move_code(from_square, to_square)
+        if promotion is not None:
+            self.set_code(promotion.kind | (code & BLACK), to_square)
+
+        if self.castling_rights:
+            castling_rights = self.castling_rights
+            if kind == KING:
+                castling_rights = castling_rights.translate(str.maketrans("", "", "kq" if code & BLACK else "KQ"))
+            for corner, right in ((63, "K"), (56, "Q"), (7, "k"), (0, "q")):
+                if from_square == corner or to_square == corner:
+                    castling_rights = castling_rights.replace(right, "")
+            self.set_castling_rights(castling_rights)
+
+        if kind == PAWN or captured:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if code & BLACK:
+            self.fullmove_number += 1
+
+        self.change_player()
+        if kind == PAWN and abs(to_row - from_row) == 2:
+            self.set_en_passant(((from_row + to_row) // 2, from_column))
+
+    def unmake_move(self) -> Move:
+        move, code, captured, castling_rights, en_passant, halfmove_clock = self.history.pop()
+        from_row, from_column, to_row, to_column, _ = move
+        from_square, to_square = from_row * 8 + from_column, to_row * 8 + to_column
+        kind = code & TYPE_MASK
+        self.game_status = None
+        self.change_player()
+
+        if kind == PAWN and (to_row, to_column) == en_passant:
+            self.set_code(EMPTY, to_square)
+            self.set_code(captured, from_row * 8 + to_column)
+        else:
+            self.set_code(captured, to_square)
+        self.set_code(code, from_square)
+
+        if kind == KING and abs(to_column - from_column) == 2:
+            if to_column == 6:
+                self.move_code(from_square + 1, from_square + 3)
+            else:
+                self.move_code(from_square - 1, from_square - 4)
+
+        self.castling_rights = castling_rights
+        self.en_passant = en_passant
+        self.halfmove_clock = halfmove_clock
+        self.key = self.key_history.pop()
+        if code & BLACK:
+            self.fullmove_number -= 1
+        return move
+
+    def set_castling_rights(self, castling_rights: str) -> None:
+        self.key ^= castling_key(self.castling_rights) ^ castling_key(castling_rights)
+        self.castling_rights = castling_rights
+        self.game_status = None
+
+    def set_en_passant(self, en_passant: tuple[int, int] | None) -> None:
+        self.key ^= self.en_passant_hash()
+        self.en_passant = en_passant
+        self.key ^= self.en_passant_hash()
+        self.game_status = None
+
+    def can_capture_en_passant(self) -> bool:
+        if self.en_passant is None:
+            return False
+        row, column = self.en_passant
+        pawn = PAWN | (BLACK if self.current_player == "B" else 0)
+        enemy = "W" if self.current_player == "B" else "B"
+        return any(self.squares[square] == pawn for square in PAWN_CAPTURES[enemy][row * 8 + column])
+
+    def en_passant_hash(self) -> int:
+        return en_passant_key(self.en_passant) if self.can_capture_en_passant() else 0
+
+    def repetition_count(self) -> int:
+        count = 1
+        for index in range(2, min(self.halfmove_clock, len(self.key_history)) + 1, 2):
+            if self.key_history[-index] == self.key:
+                count += 1
+        return count
+
+    def is_threefold_repetition(self) -> bool:
+        return self.repetition_count() >= 3
+
+    def is_fifty_move_rule(self) -> bool:
+        return self.halfmove_clock >= 100
+
+    def is_insufficient_material(self) -> bool:
+        minors = []
+        for square, code in enumerate(self.squares):
+            kind = code & TYPE_MASK
+            if kind in (PAWN, ROOK, QUEEN):
+                return False
+            if kind in (KNIGHT, BISHOP):
+                minors.append((kind, (square >> 3 ^ square) & 1))
+        if len(minors) <= 1:
+            return True
+        return all(kind == BISHOP for kind, _ in minors) and len({shade for _, shade in minors}) == 1
+
+    def draw_reason(self) -> str | None:
+        if self.is_threefold_repetition():
+            return "threefold repetition"
+        if self.is_fifty_move_rule():
+            return "fifty-move rule"
+        if self.is_insufficient_material():
+            return "insufficient material"
+        return None
+
+    def change_player(self) -> str:
+        self.game_status = None
+        self.key ^= SIDE_KEY
+        if self.current_player == "W":
+            self.current_player = "B"
+        else:
+            self.current_player = "W"
+        return self.current_player
+
+    def get_king_position(self) -> tuple[int, int]:
+        square = self.king_squares[self.current_player]
+        return COORDINATES[square] if square >= 0 else (-1, -1)
+
+    def is_checked(self) -> bool:
+        square = self.king_squares[self.current_player]
+        if square < 0:
+            return False
+        return self.attack_map["B" if self.current_player == "W" else "W"][square] > 0
+
+    def is_square_attacked(self, row: int, column: int, by_color: str, ignore: tuple[tuple[int, int], ...] = (), block: tuple[tuple[int, int], ...] = ()) -> bool:
+        squares = self.squares
+        square = row * 8 + column
+        color = BLACK if by_color == "B" else 0
+        ignored = [ignore_row * 8 + ignore_column for ignore_row, ignore_column in ignore]
+        blocked = [block_row * 8 + block_column for block_row, block_column in block]
+
+        for attacker in PAWN_CAPTURES["B" if by_color == "W" else "W"][square]:
+            if squares[attacker] == PAWN | color and attacker not in ignored:
+                return True
+
+        for attacker in KNIGHT_TARGETS[square]:
+            if squares[attacker] == KNIGHT | color and attacker not in ignored:
+                return True
+
+        for direction in KING_DIRECTIONS:
+            sliders = SLIDERS[direction]
+            for distance, attacker in enumerate(RAYS[direction][square]):
+                if attacker in blocked:
+                    break
+                code = squares[attacker]
+                if not code or attacker in ignored:
+                    continue
+                if code & BLACK == color and (code & TYPE_MASK in sliders or (distance == 0 and code & TYPE_MASK == KING)):
+                    return True
+                break
+
+        return False
+
+    def update_attacks(self, code: int, square: int, delta: int) -> None:
+        attack_map = self.attack_map[COLORS[code >> 3]]
+        kind = code & TYPE_MASK
+        if kind == PAWN:
+            targets = PAWN_CAPTURES[COLORS[code >> 3]][square]
+        elif kind == KNIGHT:
+            targets = KNIGHT_TARGETS[square]
+        elif kind == KING:
+            targets = KING_TARGETS[square]
+        else:
+            rays = QUEEN_RAYS[square] if kind == QUEEN else ROOK_RAYS[square] if kind == ROOK else BISHOP_RAYS[square]
+            for ray in rays:
+                self.update_ray(attack_map, ray, delta)
+            return
+
+        for target in targets:
+            attack_map[target] += delta
+
+    def update_rays(self, square: int, delta: int) -> None:
+        squares = self.squares
+        for direction in KING_DIRECTIONS:
+            for current in RAYS[direction][square]:
+                code = squares[current]
+                if code:
+                    if code & TYPE_MASK in SLIDERS[direction]:
+                        self.update_ray(self.attack_map[COLORS[code >> 3]], RAYS[OPPOSITES[direction]][square], delta)
+                    break
+
+    def update_ray(self, attack_map: bytearray, ray: list[int], delta: int) -> None:
+        squares = self.squares
+        for square in ray:
+            attack_map[square] += delta
+            if squares[square]:
+                break
+
+    def get_checkers(self) -> list[int]:
+        king = self.king_squares[self.current_player]
+        enemy = 0 if self.current_player == "B" else BLACK
+        squares = self.squares
+        checkers = []
+
+        for checker in PAWN_CAPTURES[self.current_player][king]:
+            if squares[checker] == PAWN | enemy:
+                checkers.append(checker)
+
+        for checker in KNIGHT_TARGETS[king]:
+            if squares[checker] == KNIGHT | enemy:
+                checkers.append(checker)
+
+        for direction in KING_DIRECTIONS:
+            for checker in RAYS[direction][king]:
+                code = squares[checker]
+                if code:
+                    if code & BLACK == enemy and code & TYPE_MASK in SLIDERS[direction]:
+                        checkers.append(checker)
+                    break
+
+        return checkers
+
+    def get_check_mask(self) -> set[int] | None:
+        checkers = self.get_checkers()
+        if len(checkers) == 0:
+            return None
+        if len(checkers) > 1:
+            return set()
+
+        checker = checkers[0]
+        mask = {checker}
+        if self.squares[checker] & TYPE_MASK in (KNIGHT, PAWN):
+            return mask
+
+        king = self.king_squares[self.current_player]
+        king_row, king_column = COORDINATES[king]
+        checker_row, checker_column = COORDINATES[checker]
+        direction = ((checker_row > king_row) - (checker_row < king_row), (checker_column > king_column) - (checker_column < king_column))
+        for square in RAYS[direction][king]:
+            if square == checker:
+                break
+            mask.add(square)
+        return mask
+
+    def get_pins(self) -> dict[int, set[int]]:
+        king = self.king_squares[self.current_player]
+        own = BLACK if self.current_player == "B" else 0
+        squares = self.squares
+        pins = {}
+
+        for direction in KING_DIRECTIONS:
+            ray = set()
+            pinned = -1
+            for square in RAYS[direction][king]:
+                ray.add(square)
+                code = squares[square]
+                if not code:
+                    continue
+                if code & BLACK == own:
+                    if pinned >= 0:
+                        break
+                    pinned = square
+                else:
+                    if pinned >= 0 and code & TYPE_MASK in SLIDERS[direction]:
+                        pins[pinned] = ray
+                    break
+
+        return pins
+
+    def legal_moves(self) -> list[Move]:
+        return self.generate_legal_moves(range(64))
+
+    def parse_move(self, text: str) -> Move:
+        for move in self.legal_moves():
+            if move.uci() == text:
+                return move
+        raise ValueError(f"Illegal move: {text}")
+
+    def parse_san(self, text: str) -> Move:
+        san = text.rstrip("+#!?").replace("0", "O")
+        moves = self.legal_moves()
+        if san in ("O-O", "O-O-O"):
+            column = 6 if san == "O-O" else 2
+            for move in moves:
+                if isinstance(self.get_piece(move.from_row, move.from_column), King) and move.from_column == 4 and move.to_column == column:
+                    return move
+            raise ValueError(f"Illegal move: {text}")
+
+        match = SAN_PATTERN.match(san)
+        if match is None:
+            raise ValueError(f"Invalid move: {text}")
+        symbol, file, rank, target, promotion = match.groups()
+        piece_type = PIECE_SYMBOLS[symbol or "P"]
+        to_row, to_column = 8 - int(target[1]), FILES.index(target[0])
+        promotion_type = PIECE_SYMBOLS[promotion] if promotion else None
+
+        candidates = []
+        for move in moves:
+            piece = self.get_piece(move.from_row, move.from_column)
+            if type(piece) is not piece_type or (move.to_row, move.to_column) != (to_row, to_column) or move.promotion is not promotion_type:
+                continue
+            if file is not None and move.from_column != FILES.index(file):
+                continue
+            if rank is not None and move.from_row != 8 - int(rank):
+                continue
+            candidates.append(move)
+
+        if len(candidates) != 1:
+            raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} move: {text}")
+        return candidates[0]
+
+    def san(self, move: Move) -> str:
+        piece = self.get_piece(move.from_row, move.from_column)
+        capture = self.get_piece(move.to_row, move.to_column) is not None or (isinstance(piece, Pawn) and (move.to_row, move.to_column) == self.en_passant)
+
+        if isinstance(piece, King) and abs(move.to_column - move.from_column) == 2:
+            text = "O-O" if move.to_column == 6 else "O-O-O"
+        elif isinstance(piece, Pawn):
+            text = (FILES[move.from_column] + "x" if capture else "") + square_name(move.to_row, move.to_column)
+            if move.promotion is not None:
+                text += "=" + move.promotion.symbol
+        else:
+            text = piece.symbol
+            rivals = [other for other in self.legal_moves() if other != move and (other.to_row, other.to_column) == (move.to_row, move.to_column) and self.get_piece(other.from_row, other.from_column) == piece]
+            if rivals:
+                if all(other.from_column != move.from_column for other in rivals):
+                    text += FILES[move.from_column]
+                elif all(other.from_row != move.from_row for other in rivals):
+                    text += str(8 - move.from_row)
+                else:
+                    text += square_name(move.from_row, move.from_column)
+            text += ("x" if capture else "") + square_name(move.to_row, move.to_column)
+
+        self.make_move(move)
+        if self.is_checked():
+            text += "#" if not self.has_legal_move() else "+"
+        self.unmake_move()
+        return text
+
+    def status(self) -> GameStatus:
+        if self.game_status is not None:
+            return self.game_status
+
+        moves = {}
+        for move in self.legal_moves():
+            moves.setdefault((move.from_row, move.from_column), []).append(move)
+
+        self.game_status = GameStatus(self.classify(len(moves) > 0), moves)
+        return self.game_status
+
+    def game_state(self) -> str:
+        if self.game_status is not None:
+            return self.game_status.state
+        return self.classify(self.has_legal_move())
+
+    def classify(self, has_moves: bool) -> str:
+        checked = self.is_checked()
+        if not has_moves:
+            return CHECKMATE if checked else STALEMATE
+        if self.is_fifty_move_rule() or self.is_threefold_repetition() or self.is_insufficient_material():
+            return DRAW
+        return CHECK if checked else IN_PROGRESS
+
+    def legal_moves_from(self, row: int, column: int) -> list[tuple[int, int]]:
+        return self.status().targets(row, column)
+
+    def generate_legal_moves(self, origins: range | list[int]) -> list[Move]:
+        return list(self.iter_legal_moves(origins))
+
+    def has_legal_move(self) -> bool:
+        if self.game_status is not None:
+            return len(self.game_status.moves) > 0
+        return next(self.iter_legal_moves(), None) is not None
+
+    def iter_legal_moves(self, origins: range | list[int] = range(64)) -> Iterator[Move]:
+        squares = self.squares
+        color = self.current_player
+        enemy = "B" if color == "W" else "W"
+        own = BLACK if color == "B" else 0
+        enemy_attacks = self.attack_map[enemy]
+        king = self.king_squares[color]
+        check_mask = self.get_check_mask() if king >= 0 else None
+        pins = self.get_pins() if king >= 0 else {}
+
+        for square in origins:
+            code = squares[square]
+            if not code or code & BLACK != own:
+                continue
+            kind = code & TYPE_MASK
+            row, column = COORDINATES[square]
+
+            if kind == KING:
+                for target in KING_TARGETS[square]:
+                    target_code = squares[target]
+                    if target_code and target_code & BLACK == own:
+                        continue
+                    if enemy_attacks[target]:
+                        continue
+                    new_row, new_column = COORDINATES[target]
+                    if check_mask is not None and self.is_square_attacked(new_row, new_column, enemy, ignore=((row, column),)):
+                        continue
+                    yield Move(row, column, new_row, new_column)
+                if check_mask is None:
+                    if self.can_castle("king"):
+                        yield Move(row, column, row, 6)
+                    if self.can_castle("queen"):
+                        yield Move(row, column, row, 2)
+                continue
+
+            if check_mask is not None and len(check_mask) == 0:
+                continue
+
+            pin = pins.get(square)
+            for target in PIECES[code].targets(self, square):
+                if pin is not None and target not in pin:
+                    continue
+                new_row, new_column = COORDINATES[target]
+                if kind == PAWN and new_column != column and not squares[target]:
+                    king_row, king_column = COORDINATES[king] if king >= 0 else (-1, -1)
+                    if king >= 0 and self.is_square_attacked(king_row, king_column, enemy, ignore=((row, column), (row, new_column)), block=((new_row, new_column),)):
+                        continue
+                elif check_mask is not None and target not in check_mask:
+                    continue
+                if kind == PAWN and (new_row == 0 or new_row == 7):
+                    for promotion in PROMOTIONS:
+                        yield Move(row, column, new_row, new_column, promotion)
+                else:
+                    yield Move(row, column, new_row, new_column)
+
+    def moves_out_of_check(self) -> dict[str, list[tuple[int, int]]]:
+        king_row, king_column = self.get_king_position()
+        moves = {}
+
+        if not self.is_checked():
+            return moves
+
+        king = self.get_piece(king_row, king_column)
+        if king is None:
+            return moves
+
+        moves[king.__repr__()] = []
+        for move in self.legal_moves():
+            piece = self.get_piece(move.from_row, move.from_column)
+            targets = moves.setdefault(piece.__repr__(), [])
+            if (move.to_row, move.to_column) not in targets:
+                targets.append((move.to_row, move.to_column))
+        return moves
+
+    def is_checkmated(self) -> bool:
+        return self.game_state() == CHECKMATE
+
+    def is_stalemated(self) -> bool:
+        return self.game_state() == STALEMATE
+
+    def can_castle(self, side: str) -> bool:
+        row = 7 if self.current_player == "W" else 0
+        enemy_attacks = self.attack_map["B" if self.current_player == "W" else "W"]
+        own = BLACK if self.current_player == "B" else 0
+        right = "K" if side == "king" else "Q"
+        if self.current_player == "B":
+            right = right.lower()
+        if right not in self.castling_rights:
+            return False
+
+        king = row * 8 + 4
+        rook = row * 8 + (7 if side == "king" else 0)
+        if self.squares[king] != KING | own or self.squares[rook] != ROOK | own:
+            return False
+
+        empty = (5, 6) if side == "king" else (1, 2, 3)
+        for column in empty:
+            if self.squares[row * 8 + column]:
+                return False
+        passed = (4, 5, 6) if side == "king" else (4, 3, 2)
+        for column in passed:
+            if enemy_attacks[row * 8 + column]:
+                return False
+        return True
+
+    def can_en_passant(self, row: int, column: int, side: str) -> bool:
+        if self.en_passant is None:
+            return False
+        forward = -1 if self.current_player == "W" else 1
+        return self.en_passant == (row + forward, column - 1 if side == "left" else column + 1)
+
+    @staticmethod
+    def is_valid_tile(row: int, column: int) -> bool:
+        return 0 <= row <= 7 and 0 <= column <= 7
@@ -0,0 +1,149 @@
+import bisect
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+PROFILE_VARIABLE = "PYCHESS_PROFILE"
+BUCKET_STEPS = 8
+BUCKETS = [2 ** (step / BUCKET_STEPS) for step in range(25 * BUCKET_STEPS + 1)]
+TARGETS = [
+    ("position", "Position", "generate_legal_moves", "move_generation"),
+    ("position", "Position", "has_legal_move", "move_generation"),
+    ("position", "Position", "status", "game_status"),
+    ("position", "Position", "is_checked", "check_test"),
+    ("position", "Position", "is_square_attacked", "attack_test"),
+    ("position", "Position", "make_move", "make_move"),
+    ("position", "Position", "unmake_move", "unmake_move"),
+    ("bitboard", "BitboardPosition", "is_square_attacked", "attack_test"),
+    ("engine", "Engine", "search", "search"),
+    ("renderer", "Renderer", "render", "frame"),
+]
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.buckets[bisect.bisect_left(BUCKETS, seconds * 1000000)] += 1
+        self.count += 1
+        self.total += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        threshold = self.count * fraction
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= threshold and count > 0:
+                return min(max(BUCKETS[index] / 1000000, self.minimum), self.maximum) if index < len(BUCKETS) else self.maximum
+        return self.maximum
+
+    def summary(self) -> dict:
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "total": round(self.total, 6),
+            "mean": round(self.total / self.count, 9),
+            "min": round(self.minimum, 9),
+            "p50": round(self.percentile(0.5), 9),
+            "p95": round(self.percentile(0.95), 9),
+            "p99": round(self.percentile(0.99), 9),
+            "max": round(self.maximum, 9),
+            "buckets_us": {f"{BUCKETS[index]:.4g}" if index < len(BUCKETS) else "inf": count for index, count in enumerate(self.buckets) if count > 0},
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.patched: list[tuple[type, str, Callable]] = []
+        self.started = time.perf_counter()
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.patched) > 0
+
+    def wrap(self, owner: type, attribute: str, name: str) -> None:
+        original = owner.__dict__[attribute]
+        counters = self.counters
+        histogram = self.histograms.setdefault(name, Histogram())
+        clock = time.perf_counter
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            counters[name] = counters.get(name, 0) + 1
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                histogram.add(clock() - start)
+
+        setattr(owner, attribute, wrapper)
+        self.patched.append((owner, attribute, original))
+
+    def install(self) -> None:
+        if self.enabled:
+            return
+        for module_name, class_name, attribute, name in TARGETS:
+            module = sys.modules.get(module_name)
+            owner = getattr(module, class_name, None) if module is not None else None
+            if owner is not None and attribute in owner.__dict__:
+                self.wrap(owner, attribute, name)
+        self.started = time.perf_counter()
+
+    def uninstall(self) -> None:
+        while self.patched:
+            owner, attribute, original = self.patched.pop()
+            setattr(owner, attribute, original)
+
+    def reset(self) -> None:
+        self.counters.clear()
+        for histogram in self.histograms.values():
+            histogram.__init__()
+        self.started = time.perf_counter()
+
+    def summary(self) -> dict:
+        return {
+            "seconds": round(time.perf_counter() - self.started, 6),
+            "counters": dict(sorted(self.counters.items())),
+            "histograms": {name: histogram.summary() for name, histogram in sorted(self.histograms.items()) if histogram.count > 0},
+        }
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+
+PROFILER = Profiler()
+
+
+def profile_path(path: str | None = None) -> str | None:
+    return path or os.environ.get(PROFILE_VARIABLE) or None
+
+
+def run(function: Callable[[], T], path: str | None) -> T:
+    if path is None:
+        return function()
+
+    PROFILER.install()
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function)
+    finally:
+        profile.dump_stats(path + ".prof")
+        PROFILER.write(path + ".json")
+        PROFILER.uninstall()
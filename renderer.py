@@ -0,0 +1,154 @@
+from atlas import SpriteAtlas
+from board import Board
+import pygame
+
+
+class Renderer:
+    FPS = 60
+    OVERLAY_ALPHA = 200
+    PANEL_MARGIN = 10
+    PANEL_FONT = 18
+
+    def __init__(self, board: Board, screen: pygame.SurfaceType, pieces: SpriteAtlas, tile_size: int, panel_width: int = 0):
+        self.board = board
+        self.screen = screen
+        self.pieces = pieces
+        self.tile_size = tile_size
+        self.background = board.create_background()
+        self.clock = pygame.time.Clock()
+
+        self.fonts: dict[int, pygame.font.Font] = {}
+        self.overlays: dict[str, pygame.Surface] = {}
+        self.snapshot = bytes(64)
+        self.dirty: set[tuple[int, int]] = set()
+        self.full_redraw = True
+
+        self.highlight: tuple[int, int] = -1, -1
+        self.moves: list[tuple[int, int]] = []
+        self.drag_image: pygame.Surface | None = None
+        self.drag_rect: pygame.Rect | None = None
+        self.panel = pygame.Rect(tile_size * 8, 0, panel_width, tile_size * 8) if panel_width > 0 else None
+        self.panel_lines: list[str] = []
+        self.panel_dirty = self.panel is not None
+
+    def font(self, size: int) -> pygame.font.Font:
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont("Arial", size)
+        return self.fonts[size]
+
+    def overlay(self, name: str, labels: list[tuple[str, int, pygame.Rect]]) -> pygame.Surface:
+        if name not in self.overlays:
+            surface = pygame.Surface((self.tile_size * 8, self.tile_size * 8))
+            surface.set_alpha(self.OVERLAY_ALPHA)
+            surface.fill((255, 255, 255))
+            for text, size, container in labels:
+                surface.blit(self.font(size).render(text, True, pygame.Color("Black")), container)
+            self.overlays[name] = surface
+        return self.overlays[name]
+
+    def show_overlay(self, name: str, labels: list[tuple[str, int, pygame.Rect]]) -> None:
+        self.render()
+        self.screen.blit(self.overlay(name, labels), (0, 0))
+        pygame.display.flip()
+        self.full_redraw = True
+
+    def tile(self, row: int, column: int) -> pygame.Rect:
+        return pygame.Rect(self.tile_size * column, self.tile_size * row, self.tile_size, self.tile_size)
+
+    def mark(self, squares: list[tuple[int, int]]) -> None:
+        for row, column in squares:
+            if 0 <= row <= 7 and 0 <= column <= 7:
+                self.dirty.add((row, column))
+
+    def mark_rect(self, rect: pygame.Rect | None) -> None:
+        if rect is None:
+            return
+        first_row, first_column = max(rect.top // self.tile_size, 0), max(rect.left // self.tile_size, 0)
+        last_row, last_column = min((rect.bottom - 1) // self.tile_size, 7), min((rect.right - 1) // self.tile_size, 7)
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                self.dirty.add((row, column))
+
+    def set_highlight(self, row: int, column: int) -> None:
+        if (row, column) != self.highlight:
+            self.mark([self.highlight, (row, column)])
+            self.highlight = row, column
+
+    def set_moves(self, moves: list[tuple[int, int]]) -> None:
+        if moves != self.moves:
+            self.mark(self.moves)
+            self.mark(moves)
+            self.moves = moves
+
+    def set_drag(self, image: pygame.Surface | None, position: tuple[int, int]) -> None:
+        self.mark_rect(self.drag_rect)
+        self.drag_image = image
+        self.drag_rect = image.get_rect(center=position) if image is not None else None
+        self.mark_rect(self.drag_rect)
+
+    def set_panel(self, lines: list[str]) -> None:
+        if lines != self.panel_lines:
+            self.panel_lines = lines
+            self.panel_dirty = self.panel is not None
+
+    def draw_panel(self) -> None:
+        self.screen.fill(pygame.Color("White"), self.panel)
+        font = self.font(self.PANEL_FONT)
+        top = self.panel.top + self.PANEL_MARGIN
+        for line in self.panel_lines:
+            self.screen.blit(font.render(line, True, pygame.Color("Black")), (self.panel.left + self.PANEL_MARGIN, top))
+            top += font.get_linesize()
+
+    def sync(self) -> None:
+        squares = self.board.squares
+        for square in range(64):
+            if squares[square] != self.snapshot[square]:
+                self.dirty.add(divmod(square, 8))
+        self.snapshot = bytes(squares)
+
+    def draw_square(self, row: int, column: int) -> None:
+        tile = self.tile(row, column)
+        self.screen.blit(self.background, tile, tile)
+
+        piece = self.board.get_piece(row, column)
+        if piece is not None:
+            self.pieces.blit(self.screen, piece.__repr__(), row, column)
+
+        if (row, column) == self.highlight:
+            pygame.draw.rect(self.screen, pygame.Color("Dark Gray"), tile, 5)
+
+        if (row, column) in self.moves:
+            pygame.draw.circle(self.screen, pygame.Color("White"), tile.center, 7)
+            pygame.draw.circle(self.screen, pygame.Color("Black"), tile.center, 5)
+
+    def render(self) -> None:
+        self.sync()
+        if self.full_redraw:
+            self.dirty = {(row, column) for row in range(8) for column in range(8)}
+            self.panel_dirty = self.panel is not None
+        if not self.dirty and not self.panel_dirty:
+            return
+
+        rects = []
+        for row, column in self.dirty:
+            self.draw_square(row, column)
+            rects.append(self.tile(row, column))
+        if self.panel_dirty:
+            self.draw_panel()
+            rects.append(self.panel)
+
+        if self.drag_image is not None:
+            self.screen.blit(self.drag_image, self.drag_rect)
+
+        if self.full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+        self.dirty = set()
+        self.full_redraw = False
+        self.panel_dirty = False
+
+    def wait(self) -> list[pygame.event.Event]:
+        if self.drag_image is not None:
+            self.clock.tick(self.FPS)
+        return [pygame.event.wait()] + pygame.event.get()
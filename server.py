@@ -0,0 +1,389 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import parallel
+from position import Position, CHECKMATE, STALEMATE, DRAW
+from profiler import Histogram
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BUFFER = 1 << 20
+MAX_ENGINE_DEPTH = 8
+HELP = "commands: new [seconds] [increment] [engine-depth] | join <id> | watch <id> | moves <id> | move <id> <uci> | resign <id> | fen <id> | stats | quit"
+
+
+class Connection:
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+    def send(self, line: str) -> None:
+        if self.writer.is_closing() or self.writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            return
+        self.writer.write(line.encode() + b"\n")
+
+
+class Game:
+    def __init__(self, game_id: int, base: float, increment: float, engine_depth: int | None):
+        self.id = game_id
+        self.position = Position()
+        self.start_fen = self.position.fen()
+        self.moves: list[str] = []
+        self.players: dict[str, Connection | None] = {"W": None, "B": None}
+        self.spectators: set[Connection] = set()
+        self.clocks = {"W": base, "B": base}
+        self.increment = increment
+        self.turn_started: float | None = None
+        self.flag_timer: asyncio.TimerHandle | None = None
+        self.engine_color = "B" if engine_depth is not None else None
+        self.engine_depth = engine_depth or 0
+        self.result: str | None = None
+        self.reason = ""
+        self.lock = asyncio.Lock()
+
+    def watchers(self) -> set[Connection]:
+        return {player for player in self.players.values() if player is not None} | self.spectators
+
+    def broadcast(self, line: str) -> None:
+        for connection in self.watchers():
+            connection.send(line)
+
+    def legal_moves(self) -> list[str]:
+        return [move.uci() for moves in self.position.status().moves.values() for move in moves]
+
+    def apply(self, text: str) -> tuple[str, str]:
+        for move in self.position.status().moves.get(self.origin(text), []):
+            if move.uci() == text:
+                san = self.position.san(move)
+                self.position.make_move(move)
+                self.moves.append(text)
+                return san, self.position.game_state()
+        raise ValueError(f"illegal move {text}")
+
+    def clock_text(self) -> str:
+        return f"{int(self.clocks['W'] * 1000)} {int(self.clocks['B'] * 1000)}"
+
+    @staticmethod
+    def origin(text: str) -> tuple[int, int]:
+        if len(text) < 4 or text[0] not in "abcdefgh" or text[1] not in "12345678":
+            raise ValueError(f"invalid move {text}")
+        return 8 - int(text[1]), "abcdefgh".index(text[0])
+
+
+def validate(game: Game, text: str) -> tuple[str, str, float]:
+    start = time.perf_counter()
+    san, state = game.apply(text)
+    return san, state, time.perf_counter() - start
+
+
+def engine_reply(fen: str, moves: list[str], depth: int, time_limit: float | None = None) -> str:
+    position = Position()
+    position.load_fen(fen)
+    for text in moves:
+        position.make_move(position.parse_move(text))
+    info = parallel.worker_engine.search(position, depth, time_limit)
+    return info.move.uci()
+
+
+class GameServer:
+    def __init__(self, executor: Executor | None = None, engine_executor: Executor | None = None):
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.engine_executor = engine_executor
+        self.games: dict[int, Game] = {}
+        self.ids = itertools.count(1)
+        self.latency = Histogram()
+        self.validation = Histogram()
+        self.moves_played = 0
+        self.connections = 0
+        self.tasks: set[asyncio.Task] = set()
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port, limit=1 << 16)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.engine_executor is not None:
+            self.engine_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = Connection(writer)
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                words = line.decode(errors="replace").split()
+                if not words:
+                    continue
+                if words[0] == "quit":
+                    connection.send("ok bye")
+                    break
+                try:
+                    connection.send("ok " + await self.dispatch(connection, words))
+                except (ValueError, IndexError) as error:
+                    connection.send(f"error {error}")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            self.disconnect(connection)
+            writer.close()
+
+    def disconnect(self, connection: Connection) -> None:
+        for game in list(self.games.values()):
+            game.spectators.discard(connection)
+            for color in ("W", "B"):
+                if game.players[color] is connection:
+                    game.players[color] = None
+                    self.finish(game, "0-1" if color == "W" else "1-0", "abandoned")
+
+    def game(self, text: str) -> Game:
+        game = self.games.get(int(text))
+        if game is None:
+            raise ValueError(f"no game {text}")
+        return game
+
+    async def dispatch(self, connection: Connection, words: list[str]) -> str:
+        command, arguments = words[0], words[1:]
+        if command == "new":
+            base = float(arguments[0]) if len(arguments) > 0 else 300.0
+            increment = float(arguments[1]) if len(arguments) > 1 else 0.0
+            engine_depth = int(arguments[2]) if len(arguments) > 2 else None
+            if engine_depth is not None and self.engine_executor is None:
+                raise ValueError("engine opponents are disabled")
+            if engine_depth is not None and not 1 <= engine_depth <= MAX_ENGINE_DEPTH:
+                raise ValueError(f"engine depth must be between 1 and {MAX_ENGINE_DEPTH}")
+            game = Game(next(self.ids), base, increment, engine_depth)
+            game.players["W"] = connection
+            self.games[game.id] = game
+            if game.engine_color is not None:
+                self.start_clock(game)
+            return f"game {game.id} W"
+        if command == "join":
+            game = self.game(arguments[0])
+            if game.players["B"] is not None or game.engine_color is not None:
+                raise ValueError(f"game {game.id} is full")
+            game.players["B"] = connection
+            self.start_clock(game)
+            game.broadcast(f"start {game.id} {game.clock_text()}")
+            return f"game {game.id} B"
+        if command == "watch":
+            game = self.game(arguments[0])
+            game.spectators.add(connection)
+            async with game.lock:
+                return f"watch {game.id} {game.position.fen()}"
+        if command == "moves":
+            game = self.game(arguments[0])
+            async with game.lock:
+                moves = await asyncio.get_running_loop().run_in_executor(self.executor, game.legal_moves)
+            return f"moves {game.id} {' '.join(moves)}"
+        if command == "move":
+            game = self.game(arguments[0])
+            await self.play(game, connection, arguments[1])
+            return f"move {game.id} {arguments[1]}"
+        if command == "resign":
+            game = self.game(arguments[0])
+            color = self.seat(game, connection)
+            self.finish(game, "0-1" if color == "W" else "1-0", "resignation")
+            return f"resign {game.id}"
+        if command == "fen":
+            game = self.game(arguments[0])
+            async with game.lock:
+                return f"fen {game.id} {game.position.fen()}"
+        if command == "stats":
+            return "stats " + json.dumps(self.stats())
+        if command == "help":
+            return HELP
+        raise ValueError(f"unknown command {command}")
+
+    def seat(self, game: Game, connection: Connection) -> str:
+        for color in ("W", "B"):
+            if game.players[color] is connection:
+                return color
+        raise ValueError(f"not a player in game {game.id}")
+
+    async def play(self, game: Game, connection: Connection | None, text: str) -> None:
+        async with game.lock:
+            if game.result is not None:
+                raise ValueError(f"game {game.id} is over")
+            color = game.position.current_player
+            if connection is not None and game.players[color] is not connection:
+                raise ValueError("not your move")
+
+            loop = asyncio.get_running_loop()
+            elapsed = loop.time() - game.turn_started if game.turn_started is not None else 0.0
+            if game.turn_started is not None and game.clocks[color] - elapsed <= 0:
+                self.flag(game, color)
+                raise ValueError("out of time")
+
+            start = time.perf_counter()
+            san, state, seconds = await loop.run_in_executor(self.executor, validate, game, text)
+            self.latency.add(time.perf_counter() - start)
+            self.validation.add(seconds)
+            self.moves_played += 1
+
+            if game.turn_started is not None:
+                game.clocks[color] += game.increment - elapsed
+                game.turn_started = loop.time()
+            game.broadcast(f"move {game.id} {text} {san} {game.clock_text()}")
+
+            if state == CHECKMATE:
+                self.finish(game, "1-0" if color == "W" else "0-1", "checkmate")
+            elif state == STALEMATE:
+                self.finish(game, "1/2-1/2", "stalemate")
+            elif state == DRAW:
+                self.finish(game, "1/2-1/2", game.position.draw_reason())
+            elif game.turn_started is not None:
+                self.start_clock(game)
+
+        if game.result is None and game.position.current_player == game.engine_color:
+            task = asyncio.create_task(self.engine_move(game))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def engine_move(self, game: Game) -> None:
+        loop = asyncio.get_running_loop()
+        remaining = game.clocks[game.engine_color]
+        if game.turn_started is not None:
+            remaining -= loop.time() - game.turn_started
+        try:
+            text = await loop.run_in_executor(self.engine_executor, engine_reply, game.start_fen, list(game.moves), game.engine_depth, max(remaining, 0.0))
+            await self.play(game, None, text)
+        except ValueError:
+            pass
+        except Exception as error:
+            print(f"engine failed in game {game.id}: {error!r}", file=sys.stderr)
+            self.finish(game, "1-0" if game.engine_color == "B" else "0-1", "engine error")
+
+    def start_clock(self, game: Game) -> None:
+        loop = asyncio.get_running_loop()
+        if game.flag_timer is not None:
+            game.flag_timer.cancel()
+        color = game.position.current_player
+        game.turn_started = loop.time()
+        game.flag_timer = loop.call_later(max(game.clocks[color], 0), self.flag, game, color)
+
+    def flag(self, game: Game, color: str) -> None:
+        if game.result is None and game.position.current_player == color:
+            game.clocks[color] = 0
+            self.finish(game, "0-1" if color == "W" else "1-0", "time")
+
+    def finish(self, game: Game, result: str, reason: str) -> None:
+        if game.result is not None:
+            return
+        game.result = result
+        game.reason = reason
+        if game.flag_timer is not None:
+            game.flag_timer.cancel()
+        game.broadcast(f"end {game.id} {result} {reason}")
+        self.games.pop(game.id, None)
+
+    def stats(self) -> dict:
+        return {
+            "games": len(self.games),
+            "connections": self.connections,
+            "moves": self.moves_played,
+            "validation_p50_ms": round(self.validation.percentile(0.5) * 1000, 3),
+            "validation_p99_ms": round(self.validation.percentile(0.99) * 1000, 3),
+            "validation_max_ms": round(self.validation.maximum * 1000, 3),
+            "latency_p50_ms": round(self.latency.percentile(0.5) * 1000, 3),
+            "latency_p99_ms": round(self.latency.percentile(0.99) * 1000, 3),
+        }
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, line: str) -> str:
+    writer.write(line.encode() + b"\n")
+    await writer.drain()
+    while True:
+        reply = (await reader.readline()).decode().strip()
+        if not reply:
+            raise ConnectionError("server closed the connection")
+        if reply.startswith("ok ") or reply.startswith("error "):
+            return reply
+
+
+async def play_random_game(host: str, port: int, plies: int, seed: int, round_trips: Histogram) -> int:
+    generator = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    game_id = (await request(reader, writer, "new 600 0")).split()[2]
+    await request(reader, writer, f"join {game_id}")
+    played = 0
+    for _ in range(plies):
+        reply = await request(reader, writer, f"moves {game_id}")
+        moves = reply.split()[3:]
+        if reply.startswith("error") or not moves:
+            break
+        start = time.perf_counter()
+        reply = await request(reader, writer, f"move {game_id} {generator.choice(moves)}")
+        round_trips.add(time.perf_counter() - start)
+        if reply.startswith("error"):
+            break
+        played += 1
+    await request(reader, writer, "quit")
+    writer.close()
+    return played
+
+
+async def bench(host: str, port: int, games: int, plies: int, seed: int) -> dict:
+    round_trips = Histogram()
+    start = time.perf_counter()
+    played = await asyncio.gather(*[play_random_game(host, port, plies, seed + index, round_trips) for index in range(games)])
+    seconds = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    server = json.loads((await request(reader, writer, "stats")).split(" ", 2)[2])
+    await request(reader, writer, "quit")
+    writer.close()
+    return {
+        "games": games,
+        "moves": sum(played),
+        "seconds": round(seconds, 3),
+        "moves_per_second": int(sum(played) / seconds) if seconds > 0 else 0,
+        "round_trip_p50_ms": round(round_trips.percentile(0.5) * 1000, 3),
+        "round_trip_p99_ms": round(round_trips.percentile(0.99) * 1000, 3),
+        "server": server,
+    }
+
+
+async def serve(host: str, port: int, engine_workers: int, book_path: str | None = None) -> None:
+    engine_executor = ProcessPoolExecutor(max_workers=engine_workers, initializer=parallel.init_worker, initargs=(1 << 16, book_path)) if engine_workers > 0 else None
+    game_server = GameServer(engine_executor=engine_executor)
+    server = await game_server.start(host, port)
+    print(f"listening on {host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        game_server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Host chess games over a line protocol.")
+    parser.add_argument("mode", choices=["serve", "bench"], help="run the server or a scripted benchmark client")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to bind or connect to")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port")
+    parser.add_argument("--engine-workers", type=int, default=os.cpu_count() or 1, help="processes for engine opponents (0 disables them)")
+    parser.add_argument("--book", default=None, help="opening book shared by the engine processes")
+    parser.add_argument("--games", type=int, default=100, help="concurrent games for bench")
+    parser.add_argument("--plies", type=int, default=40, help="plies per bench game")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for bench")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        try:
+            asyncio.run(serve(args.host, args.port, args.engine_workers, args.book))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(bench(args.host, args.port, args.games, args.plies, args.seed)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
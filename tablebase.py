@@ -0,0 +1,406 @@
+import argparse
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from piece import PIECE_TYPES, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK, TYPE_MASK
+from position import Position
+from tables import KNIGHT_TARGETS, KING_TARGETS, RAYS, ROOK_RAYS, BISHOP_RAYS, QUEEN_RAYS, PAWN_PUSHES, PAWN_CAPTURES
+
+MAX_MEN = 4
+DRAW = 0
+INVALID = 255
+CANNOT_LOSE = 255
+CHUNK_SIZE = 1 << 18
+PROMOTION_KINDS = [QUEEN, ROOK, BISHOP, KNIGHT]
+SYMBOLS = {piece_type.symbol: piece_type.kind for piece_type in PIECE_TYPES}
+KIND_SYMBOLS = {kind: symbol for symbol, kind in SYMBOLS.items()}
+
+
+def build_lines() -> tuple[list[list[int]], list[list[int]]]:
+    lines = [[0] * 64 for _ in range(64)]
+    between = [[0] * 64 for _ in range(64)]
+    for direction, rays in RAYS.items():
+        line = ROOK if direction[0] == 0 or direction[1] == 0 else BISHOP
+        for square in range(64):
+            mask = 0
+            for target in rays[square]:
+                lines[square][target] = line
+                between[square][target] = mask
+                mask |= 1 << target
+    return lines, between
+
+
+LINES, BETWEEN = build_lines()
+KNIGHT_MASKS = [sum(1 << target for target in targets) for targets in KNIGHT_TARGETS]
+KING_MASKS = [sum(1 << target for target in targets) for targets in KING_TARGETS]
+PAWN_MASKS = {color: [sum(1 << target for target in targets) for targets in PAWN_CAPTURES[color]] for color in "WB"}
+
+
+def parse_material(name: str) -> list[int]:
+    second_king = name.find("K", 1)
+    if not name.startswith("K") or second_king < 0 or any(symbol not in SYMBOLS for symbol in name):
+        raise ValueError(f"Invalid material: {name}")
+    white = [SYMBOLS[symbol] for symbol in name[:second_king]]
+    black = [SYMBOLS[symbol] | BLACK for symbol in name[second_king:]]
+    if white.count(KING) != 1 or black.count(KING | BLACK) != 1:
+        raise ValueError(f"Invalid material: {name}")
+    return canonical(white + black)
+
+
+def canonical(codes: list[int]) -> list[int]:
+    return sorted(codes, key=lambda code: (code & BLACK, code & TYPE_MASK != KING, -(code & TYPE_MASK)))
+
+
+def material_name(codes: list[int]) -> str:
+    return "".join(KIND_SYMBOLS[code & TYPE_MASK] for code in canonical(codes))
+
+
+def table_size(codes: list[int]) -> int:
+    return 2 << 6 * len(codes)
+
+
+def encode_index(side: int, squares: list[int]) -> int:
+    index = side
+    for square in squares:
+        index = index << 6 | square
+    return index
+
+
+def decode_index(index: int, men: int) -> tuple[int, list[int]]:
+    squares = [0] * men
+    for position in range(men - 1, -1, -1):
+        squares[position] = index & 63
+        index >>= 6
+    return index, squares
+
+
+def attacks(code: int, square: int, target: int, occupied: int) -> bool:
+    kind = code & TYPE_MASK
+    if kind == PAWN:
+        return PAWN_MASKS["B" if code & BLACK else "W"][square] >> target & 1 == 1
+    if kind == KNIGHT:
+        return KNIGHT_MASKS[square] >> target & 1 == 1
+    if kind == KING:
+        return KING_MASKS[square] >> target & 1 == 1
+    line = LINES[square][target]
+    if line == 0 or (kind != QUEEN and kind != line):
+        return False
+    return BETWEEN[square][target] & occupied == 0
+
+
+def is_attacked(codes: list[int], squares: list[int], target: int, by_color: int, occupied: int, skip: int = -1) -> bool:
+    for index, code in enumerate(codes):
+        if index != skip and code & BLACK == by_color and attacks(code, squares[index], target, occupied):
+            return True
+    return False
+
+
+def piece_targets(code: int, square: int, occupied: int) -> list[int]:
+    kind = code & TYPE_MASK
+    if kind == KNIGHT:
+        return KNIGHT_TARGETS[square]
+    if kind == KING:
+        return KING_TARGETS[square]
+    if kind == PAWN:
+        color = "B" if code & BLACK else "W"
+        targets = []
+        for target in PAWN_PUSHES[color][square]:
+            if occupied >> target & 1:
+                break
+            targets.append(target)
+        return targets + [target for target in PAWN_CAPTURES[color][square] if occupied >> target & 1]
+    rays = QUEEN_RAYS[square] if kind == QUEEN else ROOK_RAYS[square] if kind == ROOK else BISHOP_RAYS[square]
+    targets = []
+    for ray in rays:
+        for target in ray:
+            targets.append(target)
+            if occupied >> target & 1:
+                break
+    return targets
+
+
+def retro_targets(code: int, square: int, occupied: int) -> list[int]:
+    kind = code & TYPE_MASK
+    if kind == PAWN:
+        backward = 8 if code & BLACK == 0 else -8
+        origin = square + backward
+        if not 0 <= origin < 64 or origin // 8 in (0, 7) or occupied >> origin & 1:
+            return []
+        origins = [origin]
+        double = origin + backward
+        if (code & BLACK == 0 and square // 8 == 4) or (code & BLACK and square // 8 == 3):
+            if not occupied >> double & 1:
+                origins.append(double)
+        return origins
+    return [target for target in piece_targets(code, square, occupied) if not occupied >> target & 1]
+
+
+class Tablebase:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.tables: dict[str, mmap.mmap | None] = {}
+        self.max_men = MAX_MEN
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".tb")
+
+    def table(self, name: str) -> mmap.mmap | None:
+        if name not in self.tables:
+            path = self.path(name)
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                with open(path, "rb") as file:
+                    self.tables[name] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.tables[name] = None
+        return self.tables[name]
+
+    def close(self) -> None:
+        for table in self.tables.values():
+            if table is not None:
+                table.close()
+        self.tables = {}
+
+    def value(self, codes: list[int], squares: list[int], side: int) -> int | None:
+        order = sorted(range(len(codes)), key=lambda index: (codes[index] & BLACK, codes[index] & TYPE_MASK != KING, -(codes[index] & TYPE_MASK)))
+        table = self.table(material_name(codes))
+        if table is None:
+            return None
+        return table[encode_index(side, [squares[index] for index in order])]
+
+    def probe(self, position: Position) -> tuple[int, int] | None:
+        if position.castling_rights or position.can_capture_en_passant():
+            return None
+        codes = []
+        squares = []
+        for square, code in enumerate(position.squares):
+            if code:
+                codes.append(code)
+                squares.append(square)
+                if len(codes) > self.max_men:
+                    return None
+        value = self.value(codes, squares, 1 if position.current_player == "B" else 0)
+        return decode_value(value) if value is not None and value != INVALID else None
+
+
+def decode_value(value: int) -> tuple[int, int]:
+    if value == DRAW:
+        return 0, 0
+    distance = value - 1
+    return (1 if distance % 2 == 1 else -1), distance
+
+
+worker_tablebase: Tablebase | None = None
+
+
+def init_worker(directory: str) -> None:
+    global worker_tablebase
+    worker_tablebase = Tablebase(directory)
+
+
+def exit_value(codes: list[int], squares: list[int], side: int) -> int:
+    pieces = [(code, square) for code, square in zip(codes, squares) if square >= 0]
+    value = worker_tablebase.value([code for code, _ in pieces], [square for _, square in pieces], side)
+    if value is None:
+        raise FileNotFoundError(f"Missing table {material_name([code for code, _ in pieces])}")
+    return value
+
+
+def initialise_chunk(name: str, start: int, stop: int) -> tuple[bytes, bytes, bytes, bytes]:
+    codes = parse_material(name)
+    men = len(codes)
+    values = bytearray(stop - start)
+    counts = bytearray(stop - start)
+    exit_wins = bytearray(stop - start)
+    exit_losses = bytearray(stop - start)
+
+    for offset in range(stop - start):
+        side, squares = decode_index(start + offset, men)
+        if len(set(squares)) < men or any(code & TYPE_MASK == PAWN and squares[index] // 8 in (0, 7) for index, code in enumerate(codes)):
+            values[offset] = INVALID
+            continue
+
+        mover = BLACK if side else 0
+        occupied = 0
+        for square in squares:
+            occupied |= 1 << square
+        kings = [squares[index] for index, code in enumerate(codes) if code & TYPE_MASK == KING]
+        own_king, enemy_king = (kings[1], kings[0]) if side else (kings[0], kings[1])
+        if is_attacked(codes, squares, enemy_king, mover, occupied):
+            values[offset] = INVALID
+            continue
+
+        count = 0
+        best_win = 0
+        worst_loss = 0
+        legal = False
+        for index, code in enumerate(codes):
+            if code & BLACK != mover:
+                continue
+            origin = squares[index]
+            for target in piece_targets(code, origin, occupied):
+                captured = -1
+                if occupied >> target & 1:
+                    captured = squares.index(target)
+                    if codes[captured] & BLACK == mover:
+                        continue
+                new_squares = squares[:]
+                new_squares[index] = target
+                if captured >= 0:
+                    new_squares[captured] = -1
+                new_occupied = (occupied & ~(1 << origin)) | 1 << target
+                king = target if code & TYPE_MASK == KING else own_king
+                if is_attacked(codes, new_squares, king, BLACK - mover, new_occupied, captured):
+                    continue
+                legal = True
+
+                promotion = code & TYPE_MASK == PAWN and target // 8 in (0, 7)
+                if captured < 0 and not promotion:
+                    count += 1
+                    continue
+
+                for kind in PROMOTION_KINDS if promotion else [code & TYPE_MASK]:
+                    new_codes = codes[:]
+                    new_codes[index] = kind | mover
+                    value = exit_value(new_codes, new_squares, 1 - side)
+                    if value == DRAW:
+                        worst_loss = CANNOT_LOSE
+                    elif (value - 1) % 2 == 0:
+                        best_win = value + 1 if best_win == 0 else min(best_win, value + 1)
+                        worst_loss = CANNOT_LOSE
+                    elif worst_loss != CANNOT_LOSE:
+                        worst_loss = max(worst_loss, value + 1)
+
+        if not legal:
+            in_check = is_attacked(codes, squares, own_king, BLACK - mover, occupied)
+            values[offset] = 1 if in_check else DRAW
+            exit_losses[offset] = CANNOT_LOSE
+            continue
+        counts[offset] = count
+        exit_wins[offset] = best_win
+        exit_losses[offset] = worst_loss
+
+    return bytes(values), bytes(counts), bytes(exit_wins), bytes(exit_losses)
+
+
+def dependencies(codes: list[int]) -> list[str]:
+    names = []
+    for index, code in enumerate(codes):
+        if code & TYPE_MASK == KING:
+            continue
+        smaller = codes[:index] + codes[index + 1:]
+        names.append(material_name(smaller))
+        if code & TYPE_MASK == PAWN:
+            for kind in PROMOTION_KINDS:
+                names.append(material_name(codes[:index] + [kind | code & BLACK] + codes[index + 1:]))
+    return list(dict.fromkeys(names))
+
+
+def generate(name: str, directory: str, workers: int | None = None, log=print) -> None:
+    codes = parse_material(name)
+    name = material_name(codes)
+    if os.path.exists(os.path.join(directory, name + ".tb")):
+        return
+    for dependency in dependencies(codes):
+        generate(dependency, directory, workers, log)
+
+    start_time = time.perf_counter()
+    size = table_size(codes)
+    men = len(codes)
+    values = bytearray(size)
+    counts = bytearray(size)
+    exit_wins = bytearray(size)
+    exit_losses = bytearray(size)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_worker, initargs=(directory,)) as executor:
+        starts = range(0, size, CHUNK_SIZE)
+        for start, chunk in zip(starts, executor.map(initialise_chunk, [name] * len(starts), starts, [min(start + CHUNK_SIZE, size) for start in starts])):
+            stop = start + len(chunk[0])
+            values[start:stop], counts[start:stop], exit_wins[start:stop], exit_losses[start:stop] = chunk
+
+    pending: list[list[int]] = [[] for _ in range(INVALID)]
+    for index in range(size):
+        if values[index] == 1:
+            values[index] = DRAW
+            pending[0].append(index)
+        elif values[index] == DRAW:
+            if exit_wins[index]:
+                pending[exit_wins[index] - 1].append(index)
+            elif counts[index] == 0 and 0 < exit_losses[index] < CANNOT_LOSE:
+                pending[exit_losses[index] - 1].append(index)
+
+    for distance in range(INVALID - 1):
+        frontier = []
+        for index in pending[distance]:
+            if values[index] == DRAW:
+                values[index] = distance + 1
+                frontier.append(index)
+        pending[distance] = []
+
+        losing = distance % 2 == 0
+        for index in frontier:
+            side, squares = decode_index(index, men)
+            parent_side = 1 - side
+            parent_mover = BLACK if parent_side else 0
+            occupied = 0
+            for square in squares:
+                occupied |= 1 << square
+            for piece, code in enumerate(codes):
+                if code & BLACK != parent_mover:
+                    continue
+                for origin in retro_targets(code, squares[piece], occupied):
+                    parent_squares = squares[:]
+                    parent_squares[piece] = origin
+                    parent = encode_index(parent_side, parent_squares)
+                    if values[parent] != DRAW:
+                        continue
+                    if losing:
+                        pending[distance + 1].append(parent)
+                    else:
+                        counts[parent] -= 1
+                        if counts[parent] == 0 and exit_losses[parent] != CANNOT_LOSE:
+                            pending[max(distance + 1, exit_losses[parent] - 1)].append(parent)
+
+        if not frontier and not any(pending[distance + 1:]):
+            break
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + ".tb")
+    with open(path + ".tmp", "wb") as file:
+        file.write(values)
+    os.replace(path + ".tmp", path)
+    log(f"{name}: {size} positions in {time.perf_counter() - start_time:.1f}s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate and probe endgame tablebases for up to four men.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generate_parser = subparsers.add_parser("generate", help="solve material sets by retrograde analysis")
+    generate_parser.add_argument("materials", nargs="+", help="material sets such as KQK, KRK, KPK or KRKP")
+    generate_parser.add_argument("--directory", default="tablebases", help="where to write the tables")
+    generate_parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    probe_parser = subparsers.add_parser("probe", help="look up a position")
+    probe_parser.add_argument("fen", help="position to probe")
+    probe_parser.add_argument("--directory", default="tablebases", help="where the tables live")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        for material in args.materials:
+            if len(material) > MAX_MEN:
+                parser.error(f"{material} has more than {MAX_MEN} men")
+            generate(material, args.directory, args.workers)
+        return 0
+
+    position = Position()
+    position.load_fen(args.fen)
+    result = Tablebase(args.directory).probe(position)
+    if result is None:
+        print("not found")
+        return 1
+    outcome, distance = result
+    print(f"{('loss', 'draw', 'win')[outcome + 1]} {'in ' + str(distance) + ' plies' if outcome else ''}".strip())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
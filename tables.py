@@ -0,0 +1,54 @@
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+KNIGHT_DIRECTIONS = [(-1, -2), (1, -2), (-1, 2), (1, 2), (-2, -1), (2, -1), (-2, 1), (2, 1)]
+KING_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+
+def is_valid_tile(row: int, column: int) -> bool:
+    return 0 <= row <= 7 and 0 <= column <= 7
+
+
+def build_steps(directions: list[tuple[int, int]]) -> list[list[int]]:
+    steps = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        steps.append([(row + dir_row) * 8 + column + dir_column for dir_row, dir_column in directions if is_valid_tile(row + dir_row, column + dir_column)])
+    return steps
+
+
+def build_rays(dir_row: int, dir_column: int) -> list[list[int]]:
+    rays = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        ray = []
+        current_row, current_column = row + dir_row, column + dir_column
+        while is_valid_tile(current_row, current_column):
+            ray.append(current_row * 8 + current_column)
+            current_row += dir_row
+            current_column += dir_column
+        rays.append(ray)
+    return rays
+
+
+def build_pushes(forward: int, start_row: int) -> list[list[int]]:
+    pushes = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        if not is_valid_tile(row + forward, column):
+            pushes.append([])
+        elif row == start_row:
+            pushes.append([square + forward * 8, square + forward * 16])
+        else:
+            pushes.append([square + forward * 8])
+    return pushes
+
+
+COORDINATES = [divmod(square, 8) for square in range(64)]
+KNIGHT_TARGETS = build_steps(KNIGHT_DIRECTIONS)
+KING_TARGETS = build_steps(KING_DIRECTIONS)
+RAYS: dict[tuple[int, int], list[list[int]]] = {direction: build_rays(*direction) for direction in KING_DIRECTIONS}
+ROOK_RAYS = [[RAYS[direction][square] for direction in ROOK_DIRECTIONS] for square in range(64)]
+BISHOP_RAYS = [[RAYS[direction][square] for direction in BISHOP_DIRECTIONS] for square in range(64)]
+QUEEN_RAYS = [[RAYS[direction][square] for direction in KING_DIRECTIONS] for square in range(64)]
+PAWN_PUSHES = {"W": build_pushes(-1, 6), "B": build_pushes(1, 1)}
+PAWN_CAPTURES = {"W": build_steps([(-1, -1), (-1, 1)]), "B": build_steps([(1, -1), (1, 1)])}
@@ -0,0 +1,421 @@
+import argparse
+import json
+import math
+import os
+import shlex
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from typing import Iterator, NamedTuple
+from book import OpeningBook
+from engine import Engine
+from move import Move
+from pgn import read_games, write_game
+from position import Position, DRAW
+from profiler import Histogram
+from tablebase import Tablebase
+from uci import DEFAULT_HASH, START_FEN, table_entries
+
+MAX_PLIES = 300
+DEFAULT_MOVE_TIME = 1.0
+OPENINGS = [
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6",
+    "e2e4 e7e5 g1f3 b8c6 f1c4 f8c5",
+    "e2e4 c7c5 g1f3 d7d6 d2d4 c5d4",
+    "e2e4 c7c5 b1c3 b8c6 g2g3 g7g6",
+    "e2e4 e7e6 d2d4 d7d5 b1c3 g8f6",
+    "e2e4 c7c6 d2d4 d7d5 e4e5 c8f5",
+    "d2d4 d7d5 c2c4 e7e6 b1c3 g8f6",
+    "d2d4 d7d5 c2c4 c7c6 g1f3 g8f6",
+    "d2d4 g8f6 c2c4 e7e6 b1c3 f8b4",
+    "d2d4 g8f6 c2c4 g7g6 b1c3 f8g7",
+    "c2c4 e7e5 b1c3 g8f6 g2g3 d7d5",
+    "g1f3 d7d5 g2g3 g8f6 f1g2 c7c6",
+]
+
+
+class PlayerSpec(NamedTuple):
+    name: str
+    command: str | None = None
+    depth: int = 64
+    time: float | None = None
+    nodes: int | None = None
+    hash: int = DEFAULT_HASH
+    book: str | None = None
+    tablebases: str | None = None
+
+
+class Opening(NamedTuple):
+    fen: str
+    moves: list[str]
+
+
+class Reply(NamedTuple):
+    move: str | None
+    nodes: int
+    seconds: float
+
+
+class GameRecord(NamedTuple):
+    index: int
+    white: str
+    black: str
+    fen: str
+    moves: list[str]
+    result: str
+    reason: str
+    times: dict[str, list[float]]
+    nodes: dict[str, int]
+
+
+class Sprt(NamedTuple):
+    elo0: float
+    elo1: float
+    alpha: float = 0.05
+    beta: float = 0.05
+
+    @property
+    def bounds(self) -> tuple[float, float]:
+        return math.log(self.beta / (1 - self.alpha)), math.log((1 - self.beta) / self.alpha)
+
+
+class LocalPlayer:
+    def __init__(self, spec: PlayerSpec):
+        self.spec = spec
+        book = OpeningBook(spec.book) if spec.book is not None else None
+        tablebase = Tablebase(spec.tablebases) if spec.tablebases is not None else None
+        self.engine = Engine(table_entries(spec.hash), book, tablebase)
+
+    def new_game(self) -> None:
+        self.engine.table.clear()
+
+    def think(self, position: Position, fen: str, moves: list[str]) -> Reply:
+        start = time.perf_counter()
+        info = self.engine.search(position.copy(), self.spec.depth, self.spec.time, self.spec.nodes)
+        return Reply(info.move.uci() if info.move is not None else None, info.nodes, time.perf_counter() - start)
+
+
+class UciPlayer:
+    def __init__(self, spec: PlayerSpec):
+        self.spec = spec
+        self.process = subprocess.Popen(shlex.split(spec.command), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+        self.send("uci")
+        self.read_until("uciok")
+        self.send(f"setoption name Hash value {spec.hash}")
+        if spec.book is not None:
+            self.send(f"setoption name BookFile value {spec.book}")
+        if spec.tablebases is not None:
+            self.send(f"setoption name TablebasePath value {spec.tablebases}")
+
+    def send(self, line: str) -> None:
+        self.process.stdin.write(line + "\n")
+        self.process.stdin.flush()
+
+    def read_until(self, prefix: str) -> list[str]:
+        lines = []
+        for line in self.process.stdout:
+            lines.append(line)
+            if line.startswith(prefix):
+                return lines
+        raise RuntimeError(f"{self.spec.name} exited while waiting for {prefix}")
+
+    def new_game(self) -> None:
+        self.send("ucinewgame")
+        self.send("isready")
+        self.read_until("readyok")
+
+    def think(self, position: Position, fen: str, moves: list[str]) -> Reply:
+        limits = f"depth {self.spec.depth}"
+        if self.spec.time is not None:
+            limits += f" movetime {int(self.spec.time * 1000)}"
+        if self.spec.nodes is not None:
+            limits += f" nodes {self.spec.nodes}"
+        self.send(f"position fen {fen}" + (" moves " + " ".join(moves) if moves else ""))
+        start = time.perf_counter()
+        self.send(f"go {limits}")
+
+        nodes = 0
+        move = None
+        for line in self.read_until("bestmove"):
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == "info" and "nodes" in words[:-1]:
+                nodes = int(words[words.index("nodes") + 1])
+            elif words[0] == "bestmove" and len(words) > 1 and words[1] != "0000":
+                move = words[1]
+        return Reply(move, nodes, time.perf_counter() - start)
+
+
+worker_players: dict[PlayerSpec, LocalPlayer | UciPlayer] = {}
+
+
+def get_player(spec: PlayerSpec) -> LocalPlayer | UciPlayer:
+    if spec not in worker_players:
+        worker_players[spec] = UciPlayer(spec) if spec.command is not None else LocalPlayer(spec)
+    return worker_players[spec]
+
+
+def parse_player(words: list[str], index: int) -> PlayerSpec:
+    fields = {}
+    for word in words:
+        name, separator, value = word.partition("=")
+        if not separator or name not in PlayerSpec._fields:
+            raise argparse.ArgumentTypeError(f"invalid engine option {word!r}")
+        fields[name] = value
+    spec = PlayerSpec(fields.pop("name", f"engine{index + 1}"))
+    if not fields.keys() & {"depth", "time", "nodes"}:
+        spec = spec._replace(time=DEFAULT_MOVE_TIME)
+    converters = {"command": str, "depth": int, "time": float, "nodes": int, "hash": int, "book": str, "tablebases": str}
+    return spec._replace(**{name: converters[name](value) for name, value in fields.items()})
+
+
+def load_openings(path: str | None, plies: int) -> list[Opening]:
+    if path is None:
+        return [Opening(START_FEN, line.split()) for line in OPENINGS]
+
+    openings = []
+    with open(path, encoding="utf-8", errors="replace") as file:
+        if path.endswith(".pgn"):
+            for game in read_games(file):
+                if game.error is None:
+                    openings.append(Opening(game.headers.get("FEN", START_FEN), [move.uci() for move in game.moves[:plies]]))
+        else:
+            for line in file:
+                fields = line.split()
+                if fields:
+                    openings.append(Opening(" ".join((fields[:4] + ["0", "1"]) if len(fields) < 6 else fields[:6]), []))
+    if not openings:
+        raise ValueError(f"No openings in {path}")
+    return openings
+
+
+def adjudicate(position: Position, plies: int, max_plies: int) -> tuple[str | None, str]:
+    if position.is_checkmated():
+        return ("0-1" if position.current_player == "W" else "1-0"), "checkmate"
+    if position.is_stalemated():
+        return "1/2-1/2", "stalemate"
+    if position.game_state() == DRAW:
+        return "1/2-1/2", position.draw_reason()
+    if plies >= max_plies:
+        return "1/2-1/2", "move limit"
+    return None, ""
+
+
+def play_game(index: int, opening: Opening, white: PlayerSpec, black: PlayerSpec, max_plies: int) -> GameRecord:
+    position = Position()
+    position.load_fen(opening.fen)
+    moves = []
+    for text in opening.moves:
+        position.make_move(position.parse_move(text))
+        moves.append(text)
+
+    players = {"W": get_player(white), "B": get_player(black)}
+    for player in players.values():
+        player.new_game()
+    times: dict[str, list[float]] = {"W": [], "B": []}
+    nodes = {"W": 0, "B": 0}
+
+    while True:
+        result, reason = adjudicate(position, len(moves), max_plies)
+        if result is not None:
+            break
+        color = position.current_player
+        reply = players[color].think(position, opening.fen, moves)
+        times[color].append(reply.seconds)
+        nodes[color] += reply.nodes
+        move = next((move for move in position.legal_moves() if move.uci() == reply.move), None)
+        if move is None:
+            result, reason = ("0-1" if color == "W" else "1-0"), f"illegal move {reply.move}"
+            break
+        position.make_move(move)
+        moves.append(reply.move)
+
+    return GameRecord(index, white.name, black.name, opening.fen, moves, result, reason, times, nodes)
+
+
+def expected_score(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_difference(score: float) -> float | None:
+    if not 0 < score < 1:
+        return None
+    return -400 * math.log10(1 / score - 1)
+
+
+def score_variance(wins: int, losses: int, draws: int) -> tuple[float, float]:
+    games = wins + losses + draws
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + losses * score ** 2 + draws * (0.5 - score) ** 2) / games
+    return score, variance
+
+
+def elo_summary(wins: int, losses: int, draws: int) -> dict[str, float | None]:
+    games = wins + losses + draws
+    if games == 0:
+        return {"elo": None, "margin": None, "los": None}
+    score, variance = score_variance(wins, losses, draws)
+    deviation = math.sqrt(variance / games)
+    low, high = elo_difference(score - 1.96 * deviation), elo_difference(score + 1.96 * deviation)
+    elo = elo_difference(score)
+    los = 0.5 * (1 + math.erf((wins - losses) / math.sqrt(2 * (wins + losses)))) if wins + losses > 0 else 0.5
+    return {
+        "elo": round(elo, 1) + 0.0 if elo is not None else None,
+        "margin": round((high - low) / 2, 1) if low is not None and high is not None else None,
+        "los": round(los, 4),
+    }
+
+
+def log_likelihood_ratio(wins: int, losses: int, draws: int, sprt: Sprt) -> float:
+    games = wins + losses + draws
+    if games == 0:
+        return 0.0
+    score, variance = score_variance(wins, losses, draws)
+    if variance == 0:
+        return 0.0
+    low, high = expected_score(sprt.elo0), expected_score(sprt.elo1)
+    return games * (high - low) * (2 * score - low - high) / (2 * variance)
+
+
+def sprt_summary(wins: int, losses: int, draws: int, sprt: Sprt) -> dict[str, float | str | None]:
+    llr = log_likelihood_ratio(wins, losses, draws, sprt)
+    lower, upper = sprt.bounds
+    decision = "H1" if llr >= upper else "H0" if llr <= lower else None
+    return {"elo0": sprt.elo0, "elo1": sprt.elo1, "alpha": sprt.alpha, "beta": sprt.beta, "llr": round(llr, 3), "lower": round(lower, 3), "upper": round(upper, 3), "decision": decision}
+
+
+def tally(records: list[GameRecord], name: str) -> tuple[int, int, int]:
+    wins = losses = draws = 0
+    for record in records:
+        if record.result == "1/2-1/2":
+            draws += 1
+        elif (record.result == "1-0") == (record.white == name):
+            wins += 1
+        else:
+            losses += 1
+    return wins, losses, draws
+
+
+def performance(records: list[GameRecord], name: str) -> dict:
+    histogram = Histogram()
+    nodes = 0
+    for record in records:
+        for color, player in (("W", record.white), ("B", record.black)):
+            if player == name:
+                nodes += record.nodes[color]
+                for seconds in record.times[color]:
+                    histogram.add(seconds)
+    return {"moves": histogram.count, "nodes": nodes, "nps": int(nodes / histogram.total) if histogram.total > 0 else 0, "time_per_move": histogram.summary()}
+
+
+def parse_line(fen: str, texts: list[str]) -> list[Move]:
+    position = Position()
+    position.load_fen(fen)
+    moves = []
+    for text in texts:
+        move = position.parse_move(text)
+        position.make_move(move)
+        moves.append(move)
+    return moves
+
+
+def write_pgn(path: str, records: list[GameRecord]) -> None:
+    today = date.today().strftime("%Y.%m.%d")
+    with open(path, "w", encoding="utf-8") as file:
+        for record in sorted(records, key=lambda record: record.index):
+            headers = {"Event": "Pychess tournament", "Site": "?", "Date": today, "Round": str(record.index + 1), "White": record.white, "Black": record.black, "Termination": record.reason}
+            fen = record.fen if record.fen != START_FEN else None
+            file.write(write_game(headers, parse_line(record.fen, record.moves), record.result, fen) + "\n")
+
+
+def run(first: PlayerSpec, second: PlayerSpec, openings: list[Opening], games: int, workers: int | None = None, max_plies: int = MAX_PLIES, sprt: Sprt | None = None) -> Iterator[GameRecord]:
+    records = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = []
+        for index in range(games):
+            opening = openings[index // 2 % len(openings)]
+            white, black = (first, second) if index % 2 == 0 else (second, first)
+            futures.append(executor.submit(play_game, index, opening, white, black, max_plies))
+
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            yield record
+            if sprt is not None and sprt_summary(*tally(records, first.name), sprt)["decision"] is not None:
+                for pending in futures:
+                    pending.cancel()
+                break
+
+
+def report(first: PlayerSpec, second: PlayerSpec, records: list[GameRecord], sprt: Sprt | None, seconds: float) -> dict:
+    wins, losses, draws = tally(records, first.name)
+    summary = {
+        "players": [first._asdict(), second._asdict()],
+        "games": len(records),
+        "wins": wins,
+        "losses": losses,
+        "draws": draws,
+        "score": round((wins + draws / 2) / len(records), 4) if records else None,
+        **elo_summary(wins, losses, draws),
+        "sprt": sprt_summary(wins, losses, draws, sprt) if sprt is not None else None,
+        "performance": {first.name: performance(records, first.name), second.name: performance(records, second.name)},
+        "terminations": {},
+        "seconds": round(seconds, 3),
+        "results": [{"index": record.index, "white": record.white, "black": record.black, "result": record.result, "reason": record.reason, "plies": len(record.moves)} for record in sorted(records, key=lambda record: record.index)],
+    }
+    for record in records:
+        reason = "illegal move" if record.reason.startswith("illegal move") else record.reason
+        summary["terminations"][reason] = summary["terminations"].get(reason, 0) + 1
+    return summary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine matches on several processes and report Elo and speed.")
+    parser.add_argument("--engine", action="append", nargs="+", default=[], metavar="KEY=VALUE", help=f"engine settings: name, command (a UCI engine to run instead of the built-in one), depth, time, nodes, hash, book, tablebases; give twice; without depth, time or nodes each move gets {DEFAULT_MOVE_TIME:g} s")
+    parser.add_argument("--games", type=int, default=100, help="number of games, each opening is played with both colours")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--openings", default=None, help="FEN/EPD file or PGN file of openings (defaults to a built-in set)")
+    parser.add_argument("--opening-plies", type=int, default=8, help="plies to take from each PGN opening")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="adjudicate a draw after this many plies")
+    parser.add_argument("--sprt", type=float, nargs=2, default=None, metavar=("ELO0", "ELO1"), help="stop once the SPRT accepts or rejects ELO1 over ELO0")
+    parser.add_argument("--alpha", type=float, default=0.05, help="SPRT false positive rate")
+    parser.add_argument("--beta", type=float, default=0.05, help="SPRT false negative rate")
+    parser.add_argument("--json", default=None, help="file to write the JSON report to")
+    parser.add_argument("--pgn", default=None, help="file to write the games to")
+    args = parser.parse_args()
+
+    if len(args.engine) > 2:
+        parser.error("give at most two --engine options")
+    specs = [parse_player(words, index) for index, words in enumerate(args.engine)]
+    specs += [PlayerSpec(f"engine{index + 1}", depth=3) for index in range(len(specs), 2)]
+    first, second = specs
+    if first.name == second.name:
+        second = second._replace(name=second.name + "-2")
+    sprt = Sprt(args.sprt[0], args.sprt[1], args.alpha, args.beta) if args.sprt is not None else None
+
+    start = time.perf_counter()
+    records = []
+    for record in run(first, second, load_openings(args.openings, args.opening_plies), args.games, args.workers, args.max_plies, sprt):
+        records.append(record)
+        wins, losses, draws = tally(records, first.name)
+        print(f"game {record.index + 1} {record.white} - {record.black} {record.result} {record.reason} | {first.name} +{wins} -{losses} ={draws}", flush=True)
+
+    summary = report(first, second, records, sprt, time.perf_counter() - start)
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(summary, file, indent=2)
+    if args.pgn is not None:
+        write_pgn(args.pgn, records)
+
+    print(f"score {summary['score']} elo {summary['elo']} +/- {summary['margin']} los {summary['los']}")
+    if summary["sprt"] is not None:
+        print(" ".join(f"{name} {value}" for name, value in summary["sprt"].items()))
+    for name, stats in summary["performance"].items():
+        print(f"{name} moves {stats['moves']} nps {stats['nps']} p50 {stats['time_per_move'].get('p50')} p99 {stats['time_per_move'].get('p99')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,223 @@
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import TextIO
+import parallel
+from book import OpeningBook
+from engine import Engine, SearchInfo, format_info
+from move import Move
+from position import Position
+from tablebase import Tablebase
+
+NAME = "Pychess"
+AUTHOR = "the Pychess developers"
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+ENTRY_BYTES = 128
+DEFAULT_HASH = 32
+MAX_HASH = 4096
+MOVE_OVERHEAD = 0.05
+GO_LIMITS = ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth", "nodes", "mate")
+
+
+def table_entries(megabytes: int) -> int:
+    return max(megabytes * 1024 * 1024 // ENTRY_BYTES, 1024)
+
+
+def time_budget(limits: dict[str, int], color: str) -> float | None:
+    if "movetime" in limits:
+        return max(limits["movetime"] / 1000 - MOVE_OVERHEAD, 0.01)
+    remaining = limits.get("wtime" if color == "W" else "btime")
+    if remaining is None:
+        return None
+    increment = limits.get("winc" if color == "W" else "binc", 0)
+    moves_to_go = limits.get("movestogo", 30)
+    budget = remaining / max(moves_to_go, 1) + increment * 0.75
+    return max(min(budget, remaining * 0.5) / 1000 - MOVE_OVERHEAD, 0.01)
+
+
+class UciEngine:
+    def __init__(self, output: TextIO = sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.engine = Engine(table_entries(DEFAULT_HASH))
+        self.position = Position()
+        self.start_fen = START_FEN
+        self.moves: list[str] = []
+        self.threads = 1
+        self.search_thread: threading.Thread | None = None
+        self.stopping = threading.Event()
+        self.split_stop = multiprocessing.Event()
+        self.pool: ProcessPoolExecutor | None = None
+        self.pool_settings: tuple[int, int] | None = None
+
+    def send(self, line: str) -> None:
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self, lines: TextIO = sys.stdin) -> None:
+        for line in lines:
+            if not self.handle(line):
+                break
+        self.stop()
+        self.close_pool()
+
+    def handle(self, line: str) -> bool:
+        words = line.split()
+        if not words:
+            return True
+        try:
+            return self.execute(words[0], words[1:])
+        except (ValueError, OSError) as error:
+            self.send(f"info string error: {error}")
+            return True
+
+    def execute(self, command: str, arguments: list[str]) -> bool:
+
+        if command == "uci":
+            self.send(f"id name {NAME}")
+            self.send(f"id author {AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH} min 1 max {MAX_HASH}")
+            self.send(f"option name Threads type spin default 1 min 1 max {os.cpu_count() or 1}")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name TablebasePath type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(arguments)
+        elif command == "ucinewgame":
+            self.stop()
+            self.engine.table.clear()
+            self.close_pool()
+        elif command == "position":
+            self.stop()
+            self.set_position(arguments)
+        elif command == "go":
+            self.stop()
+            self.go(arguments)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            return False
+        elif command == "d":
+            self.send(self.position.fen())
+        return True
+
+    def set_option(self, arguments: list[str]) -> None:
+        if "name" not in arguments:
+            return
+        value_index = arguments.index("value") if "value" in arguments else len(arguments)
+        name = " ".join(arguments[arguments.index("name") + 1:value_index]).lower()
+        value = " ".join(arguments[value_index + 1:])
+
+        self.stop()
+        if name == "hash":
+            self.engine.table.resize(table_entries(min(max(int(value), 1), MAX_HASH)))
+        elif name == "threads":
+            self.threads = min(max(int(value), 1), os.cpu_count() or 1)
+        elif name == "bookfile":
+            self.engine.book = OpeningBook(value) if value and value != "<empty>" else None
+        elif name == "tablebasepath":
+            self.engine.tablebase = Tablebase(value) if value and value != "<empty>" else None
+
+    def set_position(self, arguments: list[str]) -> None:
+        if not arguments:
+            return
+        moves_index = arguments.index("moves") if "moves" in arguments else len(arguments)
+        if arguments[0] == "startpos":
+            fen = START_FEN
+        elif arguments[0] == "fen":
+            fen = " ".join(arguments[1:moves_index])
+        else:
+            return
+        moves = arguments[moves_index + 1:]
+
+        if fen == self.start_fen and moves[:len(self.moves)] == self.moves:
+            position = self.position.copy()
+            applied = len(self.moves)
+        else:
+            position = Position()
+            position.load_fen(fen)
+            applied = 0
+        for text in moves[applied:]:
+            position.make_move(position.parse_move(text))
+        self.position = position
+        self.start_fen = fen
+        self.moves = moves
+
+    def go(self, arguments: list[str]) -> None:
+        limits = {}
+        for index, word in enumerate(arguments[:-1]):
+            if word in GO_LIMITS:
+                limits[word] = int(arguments[index + 1])
+        infinite = "infinite" in arguments
+        depth = limits.get("depth", 64)
+        if "mate" in limits:
+            depth = min(depth, limits["mate"] * 2)
+        time_limit = None if infinite else time_budget(limits, self.position.current_player)
+        node_limit = limits.get("nodes")
+
+        position = self.position.copy()
+        if self.threads > 1 and not infinite and time_limit is None and node_limit is None and "depth" in limits:
+            target = lambda: self.split_search(position, depth)
+        else:
+            target = lambda: self.search(position, depth, time_limit, node_limit, infinite)
+        self.search_thread = threading.Thread(target=target, daemon=True)
+        self.search_thread.start()
+
+    def search(self, position: Position, depth: int, time_limit: float | None, node_limit: int | None, infinite: bool) -> None:
+        info = self.engine.search(position, depth, time_limit, node_limit, lambda info: self.send("info " + format_info(info, self.engine.table.hashfull())))
+        if infinite:
+            self.stopping.wait()
+        self.send_best_move(info.move)
+
+    def split_pool(self) -> ProcessPoolExecutor:
+        settings = self.threads, self.engine.table.size // self.threads
+        if self.pool is None or self.pool_settings != settings:
+            self.close_pool()
+            self.pool = ProcessPoolExecutor(max_workers=self.threads, initializer=parallel.init_worker, initargs=(settings[1], None, self.split_stop))
+            self.pool_settings = settings
+        return self.pool
+
+    def close_pool(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def split_search(self, position: Position, depth: int) -> None:
+        futures = parallel.submit_root_moves(self.split_pool(), position.fen(), depth)
+        pending: set[Future] = set(futures)
+        while pending and not self.stopping.is_set():
+            _, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+        wait([future for future in pending if not future.cancel()])
+        results = [future.result() for future in futures if future.done() and not future.cancelled()]
+        best = parallel.best_root_result(results)
+        if best is not None:
+            nodes = sum(result.nodes for result in results)
+            self.send("info " + format_info(SearchInfo(best.depth, best.score, nodes, 0.0, 0, best.pv)))
+        self.send_best_move(best.move if best is not None else None)
+
+    def send_best_move(self, move: Move | None) -> None:
+        self.send(f"bestmove {move.uci() if move is not None else '0000'}")
+
+    def stop(self) -> None:
+        if self.search_thread is not None:
+            self.stopping.set()
+            self.split_stop.set()
+            while self.search_thread.is_alive():
+                self.engine.stop()
+                self.search_thread.join(0.01)
+            self.search_thread = None
+        self.stopping.clear()
+        self.split_stop.clear()
+
+
+def main() -> None:
+    UciEngine().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import random
+
+_generator = random.Random(20240229)
+
+PIECE_KEYS: list[list[int]] = [[_generator.getrandbits(64) for _ in range(64)] for _ in range(16)]
+SIDE_KEY = _generator.getrandbits(64)
+CASTLING_KEYS: dict[str, int] = {right: _generator.getrandbits(64) for right in "KQkq"}
+EN_PASSANT_KEYS = [_generator.getrandbits(64) for _ in range(8)]
+
+
+def castling_key(castling_rights: str) -> int:
+    key = 0
+    for right in castling_rights:
+        key ^= CASTLING_KEYS[right]
+    return key
+
+
+def en_passant_key(en_passant: tuple[int, int] | None) -> int:
+    return 0 if en_passant is None else EN_PASSANT_KEYS[en_passant[1]]